@@ -10,12 +10,23 @@ import sys
 import json
 import requests
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Dict, List, Any, Tuple
 from dotenv import load_dotenv
 import time
 
 
+def _count_chunks_in_file(file_path: Path) -> Tuple[str, int]:
+    """Cuenta los chunks de un archivo enhanced_chunks_mistral_*.json"""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    
+    # Extraer nombre del archivo original
+    file_name = file_path.name.replace('enhanced_chunks_mistral_', '').replace('.json', '')
+    return file_name, len(data)
+
+
 def load_generated_chunks(output_dir: str = "src/output/rag") -> Dict[str, int]:
     """Carga y cuenta los chunks generados por archivo"""
     output_path = Path(output_dir)
@@ -25,18 +36,16 @@ def load_generated_chunks(output_dir: str = "src/output/rag") -> Dict[str, int]:
     file_chunks = {}
     enhanced_files = list(output_path.glob("enhanced_chunks_mistral_*.json"))
     
-    for file_path in enhanced_files:
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                chunk_count = len(data)
-                
-                # Extraer nombre del archivo original
-                file_name = file_path.name.replace('enhanced_chunks_mistral_', '').replace('.json', '')
+    # Lecturas concurrentes: el costo está dominado por I/O
+    max_workers = min(32, (os.cpu_count() or 1) * 4)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(_count_chunks_in_file, file_path): file_path for file_path in enhanced_files}
+        for future, file_path in futures.items():
+            try:
+                file_name, chunk_count = future.result()
                 file_chunks[file_name] = chunk_count
-                
-        except Exception as e:
-            print(f"❌ Error leyendo {file_path}: {e}")
+            except Exception as e:
+                print(f"❌ Error leyendo {file_path}: {e}")
     
     return file_chunks
 
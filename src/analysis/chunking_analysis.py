@@ -245,7 +245,7 @@ def process_pdf_for_analysis(pdf_path):
         print_stage_title("CHUNKING INTELIGENTE", 3)
         
         # Generar chunks
-        chunks = mistral_controller.intelligent_chunking(markdown_content)
+        chunks = mistral_controller.intelligent_chunking(extraction_result["pages_markdown"])
         print(f"✅ Chunks generados: {len(chunks)}")
         
         if not chunks:
@@ -1,8 +1,10 @@
 import os
+import re
+import mmap
 import sys
 import json
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import pandas as pd
 from datetime import datetime
 import PyPDF2
@@ -15,6 +17,18 @@ sys.path.append(str(project_root))
 
 load_dotenv(project_root / '.env')
 
+# Metadata columns extracted from the PDF info dictionary
+_METADATA_STRING_COLUMNS = frozenset({
+    'title', 'author', 'subject', 'creator', 'producer',
+    'creation_date', 'modification_date'
+})
+
+# Free-text columns that may carry control characters (exception messages too)
+_EXCEL_TEXT_COLUMNS = _METADATA_STRING_COLUMNS | {'error'}
+
+# Characters openpyxl/Excel refuse to store in a cell
+_EXCEL_ILLEGAL_CHARS_RE = re.compile(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F]')
+
 
 class PDFAnalyzer:
     def __init__(self, data_folder: str = "data/normativa"):
@@ -40,16 +54,31 @@ class PDFAnalyzer:
             print(f"PyPDF2 error for {file_path}: {e}")
             return None
     
-    def get_pdf_page_count_pymupdf(self, file_path: Path) -> Optional[int]:
-        """Get page count using PyMuPDF (more reliable)"""
+    def get_pdf_info_pymupdf(self, file_path: Path) -> Tuple[Optional[int], Optional[Dict[str, Any]]]:
+        """Get page count and metadata using PyMuPDF (more reliable) in a single open"""
         try:
-            doc = fitz.open(file_path)
-            page_count = len(doc)
-            doc.close()
-            return page_count
+            # Memory-map the file so the OS pages it in on demand (helps on NFS/SMB)
+            with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                doc = fitz.open(stream=mm, filetype='pdf')
+                try:
+                    page_count = len(doc)
+                    pdf_metadata = doc.metadata or {}
+                finally:
+                    doc.close()
+            
+            metadata = {
+                'title': pdf_metadata.get('title') or '',
+                'author': pdf_metadata.get('author') or '',
+                'subject': pdf_metadata.get('subject') or '',
+                'creator': pdf_metadata.get('creator') or '',
+                'producer': pdf_metadata.get('producer') or '',
+                'creation_date': pdf_metadata.get('creationDate') or '',
+                'modification_date': pdf_metadata.get('modDate') or ''
+            }
+            return page_count, metadata
         except Exception as e:
             print(f"PyMuPDF error for {file_path}: {e}")
-            return None
+            return None, None
     
     def get_pdf_metadata(self, file_path: Path) -> Dict[str, Any]:
         """Extract PDF metadata"""
@@ -95,6 +124,16 @@ class PDFAnalyzer:
         
         return metadata
     
+    def has_pdf_header(self, file_path: Path) -> bool:
+        """Cheap validity check: non-empty file with a %PDF- marker in its header"""
+        try:
+            with open(file_path, 'rb') as f:
+                # Readers accept the marker anywhere in the first 1024 bytes
+                return b'%PDF-' in f.read(1024)
+        except Exception as e:
+            print(f"Error reading header for {file_path}: {e}")
+            return False
+    
     def analyze_single_pdf(self, file_path: Path) -> Dict[str, Any]:
         """Analyze a single PDF file"""
         print(f"Analyzing: {file_path.name}")
@@ -110,12 +149,20 @@ class PDFAnalyzer:
         }
         
         # PDF-specific analysis
-        if file_path.suffix.lower() == '.pdf':
-            # Get page count using both methods
-            page_count_pypdf2 = self.get_pdf_page_count_pypdf2(file_path)
-            page_count_pymupdf = self.get_pdf_page_count_pymupdf(file_path)
+        if file_path.suffix.lower() == '.pdf' and not self.has_pdf_header(file_path):
+            # Empty or truncated file: skip the parsers, they can only fail
+            file_info['page_count'] = 'Error'
+            file_info['page_count_method'] = 'Failed'
+            file_info['pages_per_mb'] = 'N/A'
+            file_info.update({k: '' for k in _METADATA_STRING_COLUMNS})
+            file_info['error'] = 'Empty file or missing %PDF- header'
+        elif file_path.suffix.lower() == '.pdf':
+            # Use the more reliable method, falling back to PyPDF2 only on failure
+            page_count_pymupdf, metadata = self.get_pdf_info_pymupdf(file_path)
+            page_count_pypdf2 = None
+            if page_count_pymupdf is None:
+                page_count_pypdf2 = self.get_pdf_page_count_pypdf2(file_path)
             
-            # Use the more reliable method
             if page_count_pymupdf is not None:
                 file_info['page_count'] = page_count_pymupdf
                 file_info['page_count_method'] = 'PyMuPDF'
@@ -127,7 +174,8 @@ class PDFAnalyzer:
                 file_info['page_count_method'] = 'Failed'
             
             # Get metadata
-            metadata = self.get_pdf_metadata(file_path)
+            if metadata is None:
+                metadata = self.get_pdf_metadata(file_path)
             file_info.update(metadata)
             
             # Calculate pages per MB
@@ -205,30 +253,17 @@ class PDFAnalyzer:
             if value is None:
                 return ""
             if isinstance(value, str):
-                # Remove or replace illegal characters
-                import re
-                # Remove null characters and other problematic chars
-                cleaned = re.sub(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F]', '', str(value))
-                # Replace other problematic characters
-                cleaned = cleaned.replace('\x00', '').replace('\x01', '').replace('\x02', '')
-                cleaned = cleaned.replace('\x03', '').replace('\x04', '').replace('\x05', '')
-                cleaned = cleaned.replace('\x06', '').replace('\x07', '').replace('\x08', '')
-                cleaned = cleaned.replace('\x0B', '').replace('\x0C', '').replace('\x0E', '')
-                cleaned = cleaned.replace('\x0F', '').replace('\x10', '').replace('\x11', '')
-                cleaned = cleaned.replace('\x12', '').replace('\x13', '').replace('\x14', '')
-                cleaned = cleaned.replace('\x15', '').replace('\x16', '').replace('\x17', '')
-                cleaned = cleaned.replace('\x18', '').replace('\x19', '').replace('\x1A', '')
-                cleaned = cleaned.replace('\x1B', '').replace('\x1C', '').replace('\x1D', '')
-                cleaned = cleaned.replace('\x1E', '').replace('\x1F', '').replace('\x7F', '')
-                return cleaned
+                # Remove null characters and other illegal control chars
+                return _EXCEL_ILLEGAL_CHARS_RE.sub('', value)
             return str(value)
         
-        # Clean all string values in results
+        # Only the free-text columns can carry PyPDF2 binary artifacts; other
+        # columns are passed through untouched apart from None -> ""
         cleaned_results = []
         for result in results:
-            cleaned_result = {}
-            for key, value in result.items():
-                cleaned_result[key] = clean_for_excel(value)
+            cleaned_result = {key: "" if value is None else value for key, value in result.items()}
+            for key in _EXCEL_TEXT_COLUMNS.intersection(result):
+                cleaned_result[key] = clean_for_excel(result[key])
             cleaned_results.append(cleaned_result)
         
         # Create DataFrame
@@ -250,7 +285,8 @@ class PDFAnalyzer:
             'creation_date',
             'modification_date',
             'last_modified',
-            'file_path'
+            'file_path',
+            'error'
         ]
         
         # Add any missing columns
@@ -258,6 +294,9 @@ class PDFAnalyzer:
             if col not in df.columns:
                 df[col] = 'N/A'
         
+        # Only failed files carry an error message; leave the cell empty for the rest
+        df['error'] = df['error'].replace('N/A', '').fillna('')
+        
         # Reorder columns
         df = df[column_order]
         
@@ -267,8 +306,10 @@ class PDFAnalyzer:
         
         output_path = output_dir / output_file
         
-        # Create Excel writer with multiple sheets
-        with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
+        # Create Excel writer with multiple sheets (write-only report, so use
+        # xlsxwriter; constant_memory is not enabled because pandas emits
+        # cells column by column and that mode only keeps the current row)
+        with pd.ExcelWriter(output_path, engine='xlsxwriter') as writer:
             # Main detailed sheet
             df.to_excel(writer, sheet_name='Detailed Analysis', index=False)
             
@@ -0,0 +1,98 @@
+import time
+import uuid
+from typing import Optional
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+
+RAG_CACHE_COLLECTION_NAME = "rag-cache"
+# The chat frontend stores full source payloads, so it keeps its own collection
+FRONTEND_CACHE_COLLECTION_NAME = "frontend-cache"
+
+# Every semantic cache collection; ingestion empties them when the KB changes
+CACHE_COLLECTION_NAMES = (RAG_CACHE_COLLECTION_NAME, FRONTEND_CACHE_COLLECTION_NAME)
+
+class SemanticCache:
+    """
+    Answer cache keyed on the query embedding.
+
+    Entries live in their own Qdrant collection; a lookup returns the payload
+    of the nearest cached query when its cosine similarity reaches `threshold`,
+    the entry was stored for the same index fingerprint and is younger than `ttl`
+    seconds. Cache errors are logged and treated as misses so they never break a request.
+    """
+
+    def __init__(self, qdrant_client: QdrantClient, collection_name: str = RAG_CACHE_COLLECTION_NAME,
+                 vector_size: int = 768, threshold: float = 0.95, ttl: float = 24 * 3600):
+        self.qdrant_client = qdrant_client
+        self.collection_name = collection_name
+        self.threshold = threshold
+        self.ttl = ttl
+
+        collections = self.qdrant_client.get_collections().collections
+        if not any(col.name == self.collection_name for col in collections):
+            print(f"Creating new collection: {self.collection_name}")
+            self.qdrant_client.create_collection(
+                collection_name=self.collection_name,
+                vectors_config=models.VectorParams(
+                    size=vector_size,
+                    distance=models.Distance.COSINE
+                )
+            )
+            # Indexed payload fields used by the lookup filter
+            self.qdrant_client.create_payload_index(
+                collection_name=self.collection_name,
+                field_name="fingerprint",
+                field_schema=models.PayloadSchemaType.KEYWORD
+            )
+            self.qdrant_client.create_payload_index(
+                collection_name=self.collection_name,
+                field_name="created_at",
+                field_schema=models.PayloadSchemaType.FLOAT
+            )
+
+    def get(self, query_embedding: list, fingerprint: str) -> Optional[dict]:
+        if not query_embedding:
+            return None
+        try:
+            hits = self.qdrant_client.query_points(
+                collection_name=self.collection_name,
+                query=query_embedding,
+                query_filter=models.Filter(must=[
+                    models.FieldCondition(key="fingerprint", match=models.MatchValue(value=fingerprint)),
+                    models.FieldCondition(key="created_at", range=models.Range(gte=time.time() - self.ttl))
+                ]),
+                limit=1,
+                score_threshold=self.threshold,
+                with_vectors=False
+            ).points
+            return hits[0].payload if hits else None
+        except Exception as e:
+            print(f"Error reading semantic cache: {e}")
+            return None
+
+    def put(self, query_embedding: list, payload: dict, fingerprint: str) -> None:
+        if not query_embedding:
+            return
+        try:
+            self.qdrant_client.upsert(
+                collection_name=self.collection_name,
+                points=[models.PointStruct(
+                    id=str(uuid.uuid4()),
+                    vector=query_embedding,
+                    payload={**payload, "fingerprint": fingerprint, "created_at": time.time()}
+                )]
+            )
+        except Exception as e:
+            print(f"Error writing semantic cache: {e}")
+
+def clear_semantic_caches(qdrant_client: QdrantClient) -> None:
+    """Delete every cached answer (collections are kept, so running caches keep working)."""
+    existing = {col.name for col in qdrant_client.get_collections().collections}
+    for collection_name in CACHE_COLLECTION_NAMES:
+        if collection_name in existing:
+            qdrant_client.delete(
+                collection_name=collection_name,
+                points_selector=models.FilterSelector(filter=models.Filter()),
+                wait=True
+            )
+            print(f"Cleared semantic cache: {collection_name}")
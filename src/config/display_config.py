@@ -5,6 +5,9 @@ This module contains all the configuration parameters for the visual display
 and formatting of responses in the Chainlit interface.
 """
 
+from bisect import bisect_right
+from types import MappingProxyType
+
 # Message formatting settings
 MESSAGE_FORMATTING = {
     "use_emojis": True,
@@ -127,33 +130,42 @@ SOURCE_FORMATTING = {
     "separator": "\n"
 }
 
+# Complete display configuration, built once at import time
+_DISPLAY_CONFIG = MappingProxyType({
+    "message_formatting": MESSAGE_FORMATTING,
+    "source_display": SOURCE_DISPLAY,
+    "visual_elements": VISUAL_ELEMENTS,
+    "emojis": EMOJIS,
+    "relevance_icons": RELEVANCE_ICONS,
+    "follow_up_suggestions": FOLLOW_UP_SUGGESTIONS,
+    "error_messages": ERROR_MESSAGES,
+    "welcome_message": WELCOME_MESSAGE,
+    "response_formatting": RESPONSE_FORMATTING,
+    "source_formatting": SOURCE_FORMATTING
+})
+
 def get_display_config():
-    """Get the complete display configuration."""
-    return {
-        "message_formatting": MESSAGE_FORMATTING,
-        "source_display": SOURCE_DISPLAY,
-        "visual_elements": VISUAL_ELEMENTS,
-        "emojis": EMOJIS,
-        "relevance_icons": RELEVANCE_ICONS,
-        "follow_up_suggestions": FOLLOW_UP_SUGGESTIONS,
-        "error_messages": ERROR_MESSAGES,
-        "welcome_message": WELCOME_MESSAGE,
-        "response_formatting": RESPONSE_FORMATTING,
-        "source_formatting": SOURCE_FORMATTING
-    }
+    """Get the complete display configuration (read-only, shared across calls)."""
+    return _DISPLAY_CONFIG
 
 def get_emoji(key):
     """Get an emoji by key."""
     return EMOJIS.get(key, "")
 
+# Relevance buckets: scores below the first threshold map to the "low" icon
+_RELEVANCE_THRESHOLDS = [
+    SOURCE_DISPLAY["relevance_thresholds"]["medium"],
+    SOURCE_DISPLAY["relevance_thresholds"]["high"]
+]
+_RELEVANCE_BUCKET_ICONS = [
+    RELEVANCE_ICONS["low"],
+    RELEVANCE_ICONS["medium"],
+    RELEVANCE_ICONS["high"]
+]
+
 def get_relevance_icon(score):
     """Get relevance icon based on score."""
-    if score >= SOURCE_DISPLAY["relevance_thresholds"]["high"]:
-        return RELEVANCE_ICONS["high"]
-    elif score >= SOURCE_DISPLAY["relevance_thresholds"]["medium"]:
-        return RELEVANCE_ICONS["medium"]
-    else:
-        return RELEVANCE_ICONS["low"]
+    return _RELEVANCE_BUCKET_ICONS[bisect_right(_RELEVANCE_THRESHOLDS, score)]
 
 def get_random_suggestion():
     """Get a random follow-up suggestion."""
@@ -14,6 +14,9 @@ WORKFLOW: English KB + Spanish Q&A
 - LLM Responses: Always in Spanish (consistent user interface)
 """
 
+import string
+from functools import lru_cache
+
 # Language Configuration
 LANGUAGE_CONFIG = {
     "default": "english",        # System default (KB language)
@@ -102,6 +105,7 @@ Please ensure to:
     }
 }
 
+@lru_cache(maxsize=16)
 def get_system_prompt(prompt_type: str, language: str = None) -> str:
     """
     Get a system prompt by type and language.
@@ -124,6 +128,7 @@ def get_system_prompt(prompt_type: str, language: str = None) -> str:
     
     raise ValueError(f"Unknown prompt type: {prompt_type}")
 
+@lru_cache(maxsize=16)
 def get_user_prompt(prompt_type: str, language: str = None) -> str:
     """
     Get a user prompt by type and language.
@@ -146,6 +151,23 @@ def get_user_prompt(prompt_type: str, language: str = None) -> str:
     
     raise ValueError(f"Unknown prompt type: {prompt_type}")
 
+_FORMATTER = string.Formatter()
+
+@lru_cache(maxsize=32)
+def _compile_template(template: str):
+    """
+    Pre-parse a template into (literal, field) segments.
+    
+    Returns None when the template uses format specs, conversions or
+    attribute/index lookups, which need the full str.format machinery.
+    """
+    segments = []
+    for literal, field, format_spec, conversion in _FORMATTER.parse(template):
+        if field is not None and (format_spec or conversion or not field.isidentifier()):
+            return None
+        segments.append((literal, field))
+    return tuple(segments)
+
 def format_prompt(template: str, **kwargs) -> str:
     """
     Format a prompt template with the provided variables.
@@ -158,7 +180,13 @@ def format_prompt(template: str, **kwargs) -> str:
         Formatted prompt string
     """
     try:
-        return template.format(**kwargs)
+        segments = _compile_template(template)
+        if segments is None:
+            return template.format(**kwargs)
+        return "".join(
+            literal if field is None else literal + format(kwargs[field])
+            for literal, field in segments
+        )
     except KeyError as e:
         raise ValueError(f"Missing required variable in prompt template: {e}")
 
@@ -0,0 +1,60 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List
+
+
+class EmbeddingBatcher:
+    """
+    Coalesce concurrent single-text embedding requests into batched calls.
+
+    Callers block on `embed(text)` while a background worker drains the
+    queue, waits up to `max_wait_ms` for more requests to arrive, and sends
+    them to `embed_batch` in one call.
+    """
+
+    def __init__(self, embed_batch: Callable[[List[str]], List[list]],
+                 max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.embed_batch = embed_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._worker.start()
+
+    def embed(self, text: str) -> list:
+        future = Future()
+        self._queue.put((text, future))
+        try:
+            return future.result()
+        except Exception as e:
+            print(f"Error generating embedding: {e}")
+            return []
+
+    def _collect_batch(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            try:
+                embeddings = self.embed_batch([text for text, _ in batch])
+                if len(embeddings) != len(batch):
+                    raise ValueError(f"Expected {len(batch)} embeddings, got {len(embeddings)}")
+                for (_, future), embedding in zip(batch, embeddings):
+                    future.set_result(embedding)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
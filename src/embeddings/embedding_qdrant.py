@@ -1,15 +1,77 @@
 import os
+import time
 import uuid
 import ollama
+from functools import lru_cache
 from dotenv import load_dotenv
 from qdrant_client import QdrantClient
 from qdrant_client.http import models
+from cache.semantic_cache import clear_semantic_caches
 
 load_dotenv()
 
 QDRANT_URL = "http://localhost:6333"  # Default Qdrant URL
 QDRANT_COLLECTION_NAME = os.getenv("QDRANT_COLLECTION_NAME", "norms-mistral")
 
+# One point per KB collection holding its index version, bumped on every write so
+# caches can tell a re-ingest apart even when the point count is unchanged
+INDEX_META_COLLECTION_NAME = "index-meta"
+
+# Points per upload request when storing embeddings
+UPLOAD_BATCH_SIZE = 256
+
+# Search the int8 copy with 2x oversampling, then rescore with the original vectors
+_QUANTIZED_SEARCH_PARAMS = models.SearchParams(
+    quantization=models.QuantizationSearchParams(rescore=True, oversampling=2.0)
+)
+
+@lru_cache(maxsize=4)
+def _get_qdrant_client(qdrant_url: str) -> QdrantClient:
+    """Share one Qdrant client (and its connection pool) per URL."""
+    return QdrantClient(url=qdrant_url)
+
+@lru_cache(maxsize=16)
+def _ensure_collection(qdrant_url: str, qdrant_collection: str) -> None:
+    """Create the collection if missing; checked once per process."""
+    qdrant_client = _get_qdrant_client(qdrant_url)
+
+    # Check if collection exists, if not create it
+    collections = qdrant_client.get_collections().collections
+    if not any(col.name == qdrant_collection for col in collections):
+        print(f"Creating new collection: {qdrant_collection}")
+        qdrant_client.create_collection(
+            collection_name=qdrant_collection,
+            vectors_config=models.VectorParams(
+                size=768,  # Dimension for nomic-embed-text
+                distance=models.Distance.COSINE
+            ),
+            # Keep an int8 copy in RAM for the HNSW pass; originals are used to rescore
+            quantization_config=models.ScalarQuantization(
+                scalar=models.ScalarQuantizationConfig(
+                    type=models.ScalarType.INT8,
+                    quantile=0.99,
+                    always_ram=True
+                )
+            )
+        )
+
+@lru_cache(maxsize=4)
+def _ensure_index_meta_collection(qdrant_url: str) -> None:
+    """Create the index metadata collection if missing; checked once per process."""
+    qdrant_client = _get_qdrant_client(qdrant_url)
+
+    collections = qdrant_client.get_collections().collections
+    if not any(col.name == INDEX_META_COLLECTION_NAME for col in collections):
+        print(f"Creating new collection: {INDEX_META_COLLECTION_NAME}")
+        qdrant_client.create_collection(
+            collection_name=INDEX_META_COLLECTION_NAME,
+            # Payload-only points; a 1-d placeholder vector is required
+            vectors_config=models.VectorParams(size=1, distance=models.Distance.DOT)
+        )
+
+def _index_meta_point_id(qdrant_collection: str) -> str:
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"index-meta:{qdrant_collection}"))
+
 class EmbeddingControllerQdrant:
     def __init__(self, model_name: str = "nomic-embed-text", qdrant_url: str = QDRANT_URL, qdrant_collection: str =  QDRANT_COLLECTION_NAME):
         self.model_name = model_name
@@ -21,31 +83,28 @@ class EmbeddingControllerQdrant:
         if not self.qdrant_collection:
             raise ValueError("Qdrant collection name is required")
 
-        self.qdrant_client = QdrantClient(url=qdrant_url)
-
-        # Check if collection exists, if not create it
-        collections = self.qdrant_client.get_collections().collections
-        if not any(col.name == self.qdrant_collection for col in collections):
-            print(f"Creating new collection: {self.qdrant_collection}")
-            self.qdrant_client.create_collection(
-                collection_name=self.qdrant_collection,
-                vectors_config=models.VectorParams(
-                    size=768,  # Dimension for nomic-embed-text
-                    distance=models.Distance.COSINE
-                )
-            )
+        self.qdrant_client = _get_qdrant_client(qdrant_url)
+        _ensure_collection(qdrant_url, self.qdrant_collection)
+        _ensure_index_meta_collection(qdrant_url)
+        self._fingerprint = None
+        self._fingerprint_read_at = 0.0
 
-    def generate_embeddings(self, text: str) -> list:
+    def generate_embeddings(self, texts: list[str]) -> list[list[float]]:
+        """Embed all texts in a single Ollama call; failed texts map to an empty vector."""
+        if not texts:
+            return []
         try:
-            response = ollama.embed(model=self.model_name, input=text)
-            return response["embeddings"][0]
+            response = ollama.embed(model=self.model_name, input=texts)
+            return response["embeddings"]
         except Exception as e:
-            print(f"Error generating embedding: {e}")
-            return []
+            print(f"Error generating embeddings: {e}")
+            return [[] for _ in texts]
         
     def store_embeddings(self, embeddings: list, chunks: list, chunk_metadata: list = []):
         try:
             points_to_upsert = []
+            # One random UUID per call; points get consecutive ids derived from it
+            base_id = uuid.uuid4().int
             for i, (embedding, chunk) in enumerate(zip(embeddings, chunks)):
                 # Extract text content from chunk
                 if isinstance(chunk, dict):
@@ -65,35 +124,86 @@ class EmbeddingControllerQdrant:
                 }
                 
                 point = models.PointStruct(
-                    id=str(uuid.uuid4()),
+                    id=str(uuid.UUID(int=(base_id + i) % (1 << 128))),
                     vector=embedding,
                     payload=metadata
                 )
                 points_to_upsert.append(point)
             
-            # Upsert in batches
-            batch_size = 100
-            for i in range(0, len(points_to_upsert), batch_size):
-                batch = points_to_upsert[i:i + batch_size]
+            # The client chunks the points and retries failed batches without waiting
+            # for the server to apply each one; the final batch waits, and since
+            # updates are applied in order, every point is searchable on return
+            bulk_points = points_to_upsert[:-UPLOAD_BATCH_SIZE]
+            final_points = points_to_upsert[-UPLOAD_BATCH_SIZE:]
+            if bulk_points:
+                self.qdrant_client.upload_points(
+                    collection_name=self.qdrant_collection,
+                    points=bulk_points,
+                    batch_size=UPLOAD_BATCH_SIZE,
+                    wait=False
+                )
+            if final_points:
                 self.qdrant_client.upsert(
                     collection_name=self.qdrant_collection,
-                    points=batch
+                    points=final_points,
+                    wait=True
                 )
-                print(f"Upserted batch {i//batch_size + 1}/{(len(points_to_upsert)-1)//batch_size + 1}")
+            print(f"Stored {len(points_to_upsert)} points in {self.qdrant_collection}")
+            self.bump_index_version()
+            # Cached answers were generated from the previous KB
+            clear_semantic_caches(self.qdrant_client)
                 
         except Exception as e:
             print(f"Error storing embeddings: {str(e)}")
             raise
         
 
-    def load_and_query_qdrant(self, query_embedding: list, top_k: int = 4):
-        results = self.qdrant_client.search(
-            collection_name=self.qdrant_collection,
-            query_vector=query_embedding,
-            limit=top_k
+    def bump_index_version(self) -> str:
+        """Record that the KB changed; returns the new version."""
+        version = uuid.uuid4().hex
+        self.qdrant_client.upsert(
+            collection_name=INDEX_META_COLLECTION_NAME,
+            points=[models.PointStruct(
+                id=_index_meta_point_id(self.qdrant_collection),
+                vector=[1.0],
+                payload={"collection": self.qdrant_collection, "version": version, "updated_at": time.time()}
+            )],
+            wait=True
         )
-        
-        return results
+        self._fingerprint = None
+        return version
+
+    def index_version(self) -> str:
+        """Version written by the last ingestion ("0" if the KB predates versioning)."""
+        points = self.qdrant_client.retrieve(
+            collection_name=INDEX_META_COLLECTION_NAME,
+            ids=[_index_meta_point_id(self.qdrant_collection)],
+            with_payload=True,
+            with_vectors=False
+        )
+        return points[0].payload.get("version", "0") if points else "0"
 
+    def index_fingerprint(self, max_age: float = 0.0) -> str:
+        """
+        Identify the current KB index: collection, point count and ingestion version.
+        With max_age > 0, a fingerprint read less than max_age seconds ago is reused.
+        """
+        now = time.monotonic()
+        if self._fingerprint is None or now - self._fingerprint_read_at >= max_age:
+            info = self.qdrant_client.get_collection(self.qdrant_collection)
+            self._fingerprint = f"{self.qdrant_collection}:{info.points_count}:{self.index_version()}"
+            self._fingerprint_read_at = now
+        return self._fingerprint
 
-        
\ No newline at end of file
+    def load_and_query_qdrant(self, query_embedding: list, top_k: int = 4, payload_fields: list = None):
+        """Return the top_k scored points; payload_fields limits which payload keys are transferred."""
+        results = self.qdrant_client.query_points(
+            collection_name=self.qdrant_collection,
+            query=query_embedding,
+            limit=top_k,
+            with_payload=payload_fields if payload_fields is not None else True,
+            with_vectors=False,
+            search_params=_QUANTIZED_SEARCH_PARAMS
+        )
+        
+        return results.points
\ No newline at end of file
@@ -1,35 +1,64 @@
-import os, sys
+import asyncio, os, re, sys
 from pathlib import Path
 sys.path.append(os.path.join(os.path.dirname(__file__), "../"))
 
 import uvicorn
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from dotenv import load_dotenv
 from llm.mistral_llm import MistralLLM
 from translation.translate import translate_text
 from embeddings.embedding_qdrant import EmbeddingControllerQdrant
+from embeddings.embedding_batcher import EmbeddingBatcher
+from cache.semantic_cache import SemanticCache
 
 project_root = Path(__file__).parent.parent
 sys.path.append(str(project_root))
 
 load_dotenv(project_root / '.env')
 
-app = FastAPI()
-
 # Initialize LLM with Spanish language for user interface
 llm = MistralLLM(api_key=os.getenv("MISTRAL_API_KEY"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Release the pooled Mistral connections on shutdown
+    await llm.aclose()
+
+app = FastAPI(lifespan=lifespan)
 embedding_admin = EmbeddingControllerQdrant()
 
+# Concurrent /rag requests share Ollama embedding calls
+embedding_batcher = EmbeddingBatcher(embedding_admin.generate_embeddings)
+
+# Near-duplicate questions (cosine >= 0.95) reuse a previous answer built from the same KB index
+rag_cache = SemanticCache(embedding_admin.qdrant_client)
+
+# Seconds a cache lookup may reuse the last index fingerprint read from Qdrant
+FINGERPRINT_MAX_AGE = 10.0
+
+# Spanish indicators: accented characters/punctuation or common function words
+_SPANISH_INDICATORS_RE = re.compile(r"[áéíóúñ¿¡]|\b(?:de|la|el|en|y|que|por|con|para)\b")
+
 def detect_language(text: str) -> str:
     """Simple language detection for Spanish vs English."""
-    spanish_indicators = ['á', 'é', 'í', 'ó', 'ú', 'ñ', '¿', '¡', 'de', 'la', 'el', 'en', 'y', 'que', 'por', 'con', 'para']
-    text_lower = text.lower()
-    
-    spanish_count = sum(1 for indicator in spanish_indicators if indicator in text_lower)
+    # Single regex scan; count distinct indicators like the original heuristic
+    spanish_count = len(set(_SPANISH_INDICATORS_RE.findall(text.lower())))
     return "español" if spanish_count > 2 else "english"
 
+@app.head("/healthz")
+def healthz():
+    """Liveness check without a body (used by the evaluator)."""
+    return Response(status_code=200)
+
+@app.get("/fingerprint")
+def fingerprint():
+    """Identify the current KB index; changes whenever ingestion writes points."""
+    return {"fingerprint": embedding_admin.index_fingerprint()}
+
 @app.post("/rag")
-def rag(data: dict):
+async def rag(data: dict):
     """
     RAG endpoint implementing English KB + Spanish Q&A workflow.
     
@@ -39,6 +68,9 @@ def rag(data: dict):
     3. Search English KB
     4. Send English context + English question to LLM
     5. LLM responds in Spanish (using configured prompts)
+
+    Blocking clients (translation, Ollama, Qdrant) run in worker threads so the
+    event loop keeps serving other requests; Mistral is called asynchronously.
     """
     question = data.get("question")
     if not question:
@@ -50,7 +82,7 @@ def rag(data: dict):
         
         if detected_language == "español":
             # Translate Spanish question to English for KB search
-            search_query = translate_text(question, "es", "en")
+            search_query = await asyncio.to_thread(translate_text, question, "es", "en")
             print(f"🔄 Spanish question translated to English: '{question[:50]}...' → '{search_query[:50]}...'")
         else:
             # Keep English question for KB search
@@ -58,22 +90,47 @@ def rag(data: dict):
             print(f"🌐 English question used directly for KB search")
         
         # 2) Search English KB using search query
-        embed_question = embedding_admin.generate_embeddings(search_query)
-        context_response = embedding_admin.load_and_query_qdrant(embed_question, top_k=5)
-        context_texts = [match.payload['text'] for match in context_response]
-        english_context = "\n".join(context_texts)
+        embed_question = await asyncio.to_thread(embedding_batcher.embed, search_query)
+        
+        index_fingerprint = await asyncio.to_thread(embedding_admin.index_fingerprint, FINGERPRINT_MAX_AGE)
+        cached = await asyncio.to_thread(rag_cache.get, embed_question, index_fingerprint)
+        if cached:
+            print(f"⚡ Semantic cache hit, skipping KB search and LLM generation")
+            return {
+                "answer": cached["answer"],
+                "context": cached["context"],
+                "relevant_docs": cached["context"],  # Mantener compatibilidad
+                "context_sources": cached["context_sources"],
+                "workflow_info": {
+                    "user_language": detected_language,
+                    "search_language": "english",
+                    "response_language": "español",
+                    "llm_input": "english_context + english_question",
+                    "llm_output": "spanish_response",
+                    "cache_hit": True
+                }
+            }
+        
+        context_response = await asyncio.to_thread(
+            embedding_admin.load_and_query_qdrant,
+            embed_question, top_k=5, payload_fields=["text", "book_title", "page_number", "chunk_id"]
+        )
         
-        # Extract context metadata (sources)
+        # Extract context texts and metadata (sources) in a single pass
+        context_texts = []
         context_sources = []
         for match in context_response:
-            source_info = {
-                "text": match.payload.get('text', ''),
-                "book_title": match.payload.get('book_title', 'Unknown'),
-                "page_number": match.payload.get('page_number', 'Unknown'),
-                "chunk_id": match.payload.get('chunk_id', 'Unknown'),
+            payload = match.payload
+            text = payload.get('text', '')
+            context_texts.append(text)
+            context_sources.append({
+                "text": text,
+                "book_title": payload.get('book_title', 'Unknown'),
+                "page_number": payload.get('page_number', 'Unknown'),
+                "chunk_id": payload.get('chunk_id', 'Unknown'),
                 "score": match.score
-            }
-            context_sources.append(source_info)
+            })
+        english_context = "\n".join(context_texts)
         
         print(f"📚 English KB context retrieved: {len(context_texts)} chunks")
         
@@ -85,10 +142,17 @@ def rag(data: dict):
         llm.language = "español"
         
         # 5) Generate Spanish response using English context + English question
-        answer = llm.mistral_chat(context=english_context, question=search_query)
+        answer = await llm.amistral_chat(context=english_context, question=search_query)
         
         print(f"✅ Spanish response generated successfully")
         
+        await asyncio.to_thread(rag_cache.put, embed_question, {
+            "question": search_query,
+            "answer": answer,
+            "context": context_texts,
+            "context_sources": context_sources
+        }, index_fingerprint)
+        
         return {
             "answer": answer,
             "context": context_texts,
@@ -0,0 +1,72 @@
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import diskcache
+from langchain_core.embeddings import Embeddings
+
+
+class BatchingEmbeddings(Embeddings):
+    """
+    Agrupa las peticiones de embeddings que RAGAS envía a un modelo de LangChain.
+
+    embed_documents divide los textos en lotes de `batch_size` y envía cada lote
+    en una sola llamada al modelo interno; los lotes se procesan en paralelo
+    (hasta `max_workers`) y los vectores se devuelven en el orden de entrada.
+    Con `cache_dir`, los vectores ya calculados se reutilizan entre preguntas
+    y ejecuciones y solo los textos nuevos llegan al modelo.
+    """
+
+    def __init__(self, inner: Embeddings, batch_size: int = 32, max_workers: int = 8,
+                 cache_dir: Optional[str] = None):
+        self._inner = inner
+        self.batch_size = batch_size
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="embeddings-batch")
+        self._cache = diskcache.Cache(str(cache_dir)) if cache_dir else None
+        # Vectores de modelos distintos no deben mezclarse en la caché
+        self._cache_prefix = f"{getattr(inner, 'model', type(inner).__name__)}:"
+
+    def _cache_key(self, text: str) -> str:
+        # BLAKE2b basta para una clave de caché (no es un uso criptográfico)
+        return self._cache_prefix + hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+    def _embed_uncached(self, texts: List[str]) -> List[List[float]]:
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        embeddings = []
+        for batch_embeddings in self._executor.map(self._inner.embed_documents, batches):
+            embeddings.extend(batch_embeddings)
+        return embeddings
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self._cache is None:
+            return self._embed_uncached(texts)
+
+        keys = [self._cache_key(text) for text in texts]
+        embeddings = [self._cache.get(key) for key in keys]
+
+        # Textos sin vector en caché (cada texto distinto se envía una sola vez)
+        missing = {}
+        for i, embedding in enumerate(embeddings):
+            if embedding is None:
+                missing.setdefault(keys[i], texts[i])
+
+        if missing:
+            for key, embedding in zip(missing, self._embed_uncached(list(missing.values()))):
+                self._cache.set(key, embedding)
+                missing[key] = embedding
+            embeddings = [missing[key] if embedding is None else embedding
+                          for key, embedding in zip(keys, embeddings)]
+
+        return embeddings
+
+    def embed_query(self, text: str) -> List[float]:
+        if self._cache is None:
+            return self._inner.embed_query(text)
+
+        # Algunos modelos embeben consultas y documentos de forma distinta
+        key = "query:" + self._cache_key(text)
+        embedding = self._cache.get(key)
+        if embedding is None:
+            embedding = self._inner.embed_query(text)
+            self._cache.set(key, embedding)
+        return embedding
@@ -0,0 +1,85 @@
+import asyncio
+import hashlib
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import diskcache
+from langchain_core.outputs import LLMResult
+from langchain_core.prompt_values import PromptValue
+from ragas.llms import LangchainLLMWrapper
+
+
+class CachedLLMWrapper(LangchainLLMWrapper):
+    """
+    LangchainLLMWrapper que guarda en disco las generaciones del LLM evaluador.
+
+    La clave es el SHA-256 del modelo, el prompt y los parámetros de generación,
+    así que al repetir una evaluación solo llegan al LLM los prompts nuevos
+    (muestras o métricas añadidas/modificadas). Las entradas caducan tras `expire`
+    segundos.
+
+    Dentro de una ejecución, los prompts repetidos entre métricas se resuelven
+    en memoria antes de consultar el disco, y los prompts idénticos que están en
+    vuelo a la vez comparten una sola llamada al LLM.
+    """
+
+    def __init__(self, langchain_llm, cache_dir: Path, expire: float = 7 * 24 * 3600, **kwargs):
+        super().__init__(langchain_llm, **kwargs)
+        self._cache = diskcache.Cache(str(cache_dir))
+        self._expire = expire
+        self._memory: Dict[str, LLMResult] = {}
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    def _cache_key(self, prompt: PromptValue, n: int, temperature: Optional[float],
+                   stop: Optional[List[str]]) -> str:
+        model = getattr(self.langchain_llm, "model", type(self.langchain_llm).__name__)
+        raw = repr((model, prompt.to_string(), n, temperature, stop))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _lookup(self, key: str) -> Optional[LLMResult]:
+        result = self._memory.get(key)
+        if result is None:
+            result = self._cache.get(key)
+            if result is not None:
+                self._memory[key] = result
+        return result
+
+    def _store(self, key: str, result: LLMResult):
+        self._memory[key] = result
+        self._cache.set(key, result, expire=self._expire)
+
+    def clear_memory(self):
+        """Vacía la capa en memoria al terminar una evaluación (la caché en disco se conserva)"""
+        self._memory.clear()
+
+    def generate_text(self, prompt: PromptValue, n: int = 1, temperature: Optional[float] = None,
+                      stop: Optional[List[str]] = None, callbacks=None) -> LLMResult:
+        key = self._cache_key(prompt, n, temperature, stop)
+        result = self._lookup(key)
+        if result is None:
+            result = super().generate_text(prompt, n=n, temperature=temperature, stop=stop, callbacks=callbacks)
+            self._store(key, result)
+        return result
+
+    async def agenerate_text(self, prompt: PromptValue, n: int = 1, temperature: Optional[float] = None,
+                             stop: Optional[List[str]] = None, callbacks=None) -> LLMResult:
+        key = self._cache_key(prompt, n, temperature, stop)
+        result = self._lookup(key)
+        if result is not None:
+            return result
+
+        # Otro worker ya está generando este mismo prompt: esperar su resultado
+        pending = self._in_flight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        task = asyncio.ensure_future(
+            super().agenerate_text(prompt, n=n, temperature=temperature, stop=stop, callbacks=callbacks)
+        )
+        self._in_flight[key] = task
+        try:
+            result = await task
+        finally:
+            self._in_flight.pop(key, None)
+        self._store(key, result)
+        return result
@@ -10,7 +10,7 @@ Funcionalidades:
 - Carga dataset desde JSON Lines
 - Cliente HTTP para llamar a api_rag.py
 - Configuración RAGAS con Mistral como LLM evaluador
-- Procesamiento por batches de las 64 preguntas
+- Consultas concurrentes a la API solapadas con la evaluación RAGAS por lotes
 - Cálculo de métricas: faithfulness, answer_relevancy, context_precision, context_recall
 - Generación de reporte completo con análisis por tipo de pregunta
 - Exportar resultados a CSV/JSON
@@ -21,17 +21,26 @@ Fecha: 2025-09-05
 
 import os
 import sys
+import csv
+import hashlib
+import argparse
 import json
 import time
+import orjson
 import math
 import logging
+import warnings
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import asyncio
+import diskcache
 from pathlib import Path
-from typing import List, Dict, Any, Optional
-from dataclasses import dataclass
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Set, Tuple
+from collections import defaultdict
+from functools import lru_cache
+from dataclasses import asdict, dataclass, fields
 from datetime import datetime
-import pandas as pd
 
 # Agregar directorio global para langchain_mistralai
 sys.path.append('/usr/local/lib/python3.12/dist-packages')
@@ -40,23 +49,8 @@ sys.path.append('/usr/local/lib/python3.12/dist-packages')
 from dotenv import load_dotenv
 load_dotenv(Path(__file__).parent.parent.parent / '.env')
 
-# RAGAS imports
-from ragas import evaluate
-from ragas.metrics import (
-    faithfulness,
-    answer_relevancy,
-    context_precision,
-    context_recall,
-    answer_correctness
-)
-from ragas.llms import LangchainLLMWrapper
-from ragas.embeddings import LangchainEmbeddingsWrapper
-from datasets import Dataset
-
-# LangChain imports for Mistral
-from langchain_community.llms import Ollama
-from langchain_community.embeddings import OllamaEmbeddings as LangChainOllamaEmbeddings
-from langchain_mistralai import ChatMistralAI as LangChainMistralAI
+# RAGAS, datasets, LangChain, aiohttp y NumPy se importan dentro de los métodos
+# que los usan: cargar el módulo (o `--help`) no paga su tiempo de importación
 
 # Setup logging
 logging.basicConfig(
@@ -69,7 +63,40 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@dataclass
+# Métricas agregadas por tipo de pregunta -> atributo de EvaluationResult
+_TYPE_METRIC_FIELDS = {
+    "faithfulness": "faithfulness_score",
+    "answer_relevancy": "answer_relevancy_score",
+    "context_precision": "context_precision_score",
+    "context_recall": "context_recall_score",
+    "answer_correctness": "answer_correctness_score",
+    "api_response_time": "api_response_time",
+    "evaluation_time": "evaluation_time"
+}
+
+# Atributos de EvaluationResult promediados en las métricas generales del reporte
+_REPORT_METRIC_FIELDS = (
+    "faithfulness_score",
+    "answer_relevancy_score",
+    "context_precision_score",
+    "context_recall_score",
+    "answer_correctness_score",
+    "api_response_time"
+)
+
+@lru_cache(maxsize=1)
+def ragas_schema():
+    """Esquema Arrow de las filas que recibe RAGAS (se construye una sola vez)"""
+    import pyarrow as pa
+    
+    return pa.schema([
+        ("question", pa.string()),
+        ("answer", pa.string()),
+        ("ground_truth", pa.string()),
+        ("contexts", pa.list_(pa.string()))
+    ])
+
+@dataclass(slots=True)
 class EvaluationResult:
     """Estructura para almacenar resultados de evaluación"""
     question: str
@@ -87,6 +114,36 @@ class EvaluationResult:
     context_sources: Optional[List[Dict[str, Any]]] = None
     error: Optional[str] = None
 
+class RAGResponseCache:
+    """
+    Caché en disco de respuestas de la API RAG, por pregunta exacta.
+    
+    Evita repetir consultas idénticas entre ejecuciones (re-ejecuciones, ajustes
+    de métricas). La clave incluye la huella del índice de la API (/fingerprint),
+    así que al reindexar la base de conocimiento las respuestas previas dejan de
+    usarse. Las entradas caducan tras `ttl` segundos y, al superar `size_limit`
+    bytes, se descartan las menos usadas. Solo se guardan respuestas exitosas.
+    """
+    
+    def __init__(self, cache_dir: Path, ttl: float = 24 * 3600, size_limit: int = 100 * 1024 * 1024):
+        self._cache = diskcache.Cache(str(cache_dir), size_limit=size_limit,
+                                      eviction_policy="least-recently-used")
+        self.ttl = ttl
+    
+    @staticmethod
+    def _key(question: str, index_fingerprint: str) -> str:
+        return f"{index_fingerprint}:{hashlib.sha256(question.encode('utf-8')).hexdigest()}"
+    
+    def get(self, question: str, index_fingerprint: str) -> Optional[Dict[str, Any]]:
+        return self._cache.get(self._key(question, index_fingerprint))
+    
+    def set(self, question: str, index_fingerprint: str, api_response: Dict[str, Any]):
+        if api_response.get("success"):
+            self._cache.set(self._key(question, index_fingerprint), api_response, expire=self.ttl)
+    
+    def close(self):
+        self._cache.close()
+
 class RAGEvaluator:
     """
     Evaluador principal del sistema RAG usando RAGAS.
@@ -99,46 +156,106 @@ class RAGEvaluator:
     - Generación de reportes
     """
     
-    def __init__(self, api_url: str = "http://localhost:8001", dataset_path: str = None):
+    def __init__(self, api_url: str = "http://localhost:8001", dataset_path: str = None,
+                 checkpoint_path: str = None, use_response_cache: bool = True,
+                 ragas_max_workers: Optional[int] = None, dataset: Optional[List[Dict[str, Any]]] = None):
         """
         Inicializa el evaluador RAG.
         
         Args:
             api_url: URL de la API RAG existente
             dataset_path: Ruta al dataset de evaluación
+            checkpoint_path: Archivo JSON Lines con los resultados ya evaluados
+            use_response_cache: Reutilizar respuestas de la API guardadas en ejecuciones previas
+            ragas_max_workers: Llamadas simultáneas de RAGAS al LLM/embeddings
+                (por defecto una por métrica y fila del lote, hasta 32)
+            dataset: Preguntas a evaluar; si se indica, reemplaza al archivo `dataset_path`
         """
         self.api_url = api_url
         self.dataset_path = dataset_path or Path(__file__).parent / "data" / "evaluation_dataset.jsonl"
+        self._dataset = dataset
         self.results: List[EvaluationResult] = []
+        self.ragas_max_workers = ragas_max_workers
+        
+        # Checkpoint incremental: cada resultado exitoso se añade al archivo al producirse
+        self.checkpoint_path = Path(
+            checkpoint_path or Path(__file__).parent / "evaluation_results" / "results.partial.jsonl"
+        )
+        self._index_fingerprint: Optional[str] = None
         
-        # Configurar Mistral para RAGAS
-        self._setup_mistral_for_ragas()
+        # Sesión HTTP con pool de conexiones keep-alive para las llamadas síncronas a la API
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=16,
+            pool_maxsize=16,
+            max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=[502, 503, 504])
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
         
-        # Configurar métricas RAGAS
-        self._setup_ragas_metrics()
+        try:
+            # Configurar Mistral para RAGAS
+            self._setup_mistral_for_ragas()
+            
+            # Configurar métricas RAGAS
+            self._setup_ragas_metrics()
+        except Exception:
+            self.session.close()
+            raise
+        
+        # Archivos abiertos tras la configuración: si esta falla no quedan handles sin cerrar
+        self.checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+        self._checkpoint_file = open(self.checkpoint_path, 'a', encoding='utf-8', buffering=1)
+        
+        # Respuestas de la API ya obtenidas para la misma pregunta
+        self.response_cache = (
+            RAGResponseCache(self.checkpoint_path.parent / ".rag_cache") if use_response_cache else None
+        )
         
         logger.info("RAGEvaluator inicializado correctamente")
     
+    def close(self):
+        """Cierra la sesión HTTP, el archivo de checkpoint y la caché de respuestas"""
+        self.session.close()
+        self._checkpoint_file.close()
+        if self.response_cache is not None:
+            self.response_cache.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
     def _setup_mistral_for_ragas(self):
         """Configura Mistral como LLM evaluador para RAGAS"""
         try:
+            from ragas.embeddings import LangchainEmbeddingsWrapper
+            from langchain_ollama import OllamaEmbeddings as LangChainOllamaEmbeddings
+            from langchain_mistralai import ChatMistralAI as LangChainMistralAI
+            from batching_embeddings import BatchingEmbeddings
+            from cached_llm import CachedLLMWrapper
+            
             # Configurar Mistral usando LangChain
             mistral_langchain = LangChainMistralAI(
                 api_key=os.getenv("MISTRAL_API_KEY"),
                 model="mistral-large-latest"
             )
             
-            # Envolver con LangchainLLMWrapper para RAGAS
-            self.mistral_llm = LangchainLLMWrapper(mistral_langchain)
+            # Envolver para RAGAS, guardando en disco las generaciones por prompt
+            self.mistral_llm = CachedLLMWrapper(mistral_langchain, cache_dir=Path(__file__).parent / ".llm_cache")
             
-            # Configurar embeddings de Ollama usando LangChain
+            # Configurar embeddings de Ollama usando LangChain (un /api/embed por lote de textos)
             ollama_langchain = LangChainOllamaEmbeddings(
                 model="nomic-embed-text",
                 base_url="http://localhost:11434"
             )
             
-            # Envolver con LangchainEmbeddingsWrapper para RAGAS
-            self.ollama_embeddings = LangchainEmbeddingsWrapper(ollama_langchain)
+            # Envolver con LangchainEmbeddingsWrapper para RAGAS, agrupando los textos en lotes
+            # y reutilizando entre ejecuciones los vectores de contextos y ground truths ya calculados
+            self.ollama_embeddings = LangchainEmbeddingsWrapper(
+                BatchingEmbeddings(ollama_langchain, cache_dir=Path(__file__).parent / ".emb_cache")
+            )
             
             logger.info("Mistral configurado correctamente para RAGAS")
             
@@ -148,6 +265,14 @@ class RAGEvaluator:
     
     def _setup_ragas_metrics(self):
         """Configura las métricas RAGAS a utilizar"""
+        from ragas.metrics import (
+            faithfulness,
+            answer_relevancy,
+            context_precision,
+            context_recall,
+            answer_correctness
+        )
+        
         self.metrics = [
             faithfulness,
             answer_relevancy,
@@ -165,17 +290,7 @@ class RAGEvaluator:
             Lista de diccionarios con las preguntas de evaluación
         """
         try:
-            dataset = []
-            with open(self.dataset_path, 'r', encoding='utf-8') as f:
-                for line_num, line in enumerate(f, 1):
-                    line = line.strip()
-                    if line:
-                        try:
-                            data = json.loads(line)
-                            dataset.append(data)
-                        except json.JSONDecodeError as e:
-                            logger.warning(f"Error en línea {line_num}: {e}")
-                            continue
+            dataset = list(self.iter_dataset())
             
             logger.info(f"Dataset cargado: {len(dataset)} preguntas")
             return dataset
@@ -187,6 +302,65 @@ class RAGEvaluator:
             logger.error(f"Error cargando dataset: {e}")
             raise
     
+    def fetch_index_fingerprint(self) -> Optional[str]:
+        """
+        Obtiene la huella del índice de la API para validar la caché de respuestas.
+        
+        Returns:
+            Huella del índice, o None si la API no la expone
+        """
+        try:
+            response = self.session.get(f"{self.api_url}/fingerprint", timeout=2)
+            if response.status_code == 200:
+                return response.json().get("fingerprint")
+            logger.warning(f"/fingerprint respondió con código {response.status_code}")
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"No se pudo obtener la huella del índice: {e}")
+        return None
+    
+    def _cached_response(self, question: str) -> Optional[Dict[str, Any]]:
+        """Respuesta en caché para la pregunta, si existe para el índice actual"""
+        if self.response_cache is None or self._index_fingerprint is None:
+            return None
+        return self.response_cache.get(question, self._index_fingerprint)
+    
+    def _cache_response(self, question: str, api_response: Dict[str, Any]):
+        """Guarda la respuesta en caché asociada al índice actual"""
+        if self.response_cache is not None and self._index_fingerprint is not None:
+            self.response_cache.set(question, self._index_fingerprint, api_response)
+    
+    def _refresh_index_fingerprint(self):
+        """Actualiza la huella del índice (valida la caché de respuestas y el checkpoint)"""
+        self._index_fingerprint = self.fetch_index_fingerprint()
+        if self._index_fingerprint is None and self.response_cache is not None:
+            logger.warning("Sin huella del índice: la caché de respuestas no se usará en esta ejecución")
+    
+    def iter_dataset(self) -> Iterator[Dict[str, Any]]:
+        """
+        Recorre el dataset de evaluación línea a línea sin cargarlo entero.
+        
+        Yields:
+            Diccionario con una pregunta de evaluación
+        """
+        if self._dataset is not None:
+            yield from self._dataset
+            return
+        
+        with open(self.dataset_path, 'rb') as f:
+            for line_num, line in enumerate(f, 1):
+                line = line.strip()
+                if line:
+                    try:
+                        data = orjson.loads(line)
+                    except orjson.JSONDecodeError:
+                        # orjson rechaza los literales NaN/Infinity que sí acepta json
+                        try:
+                            data = json.loads(line)
+                        except json.JSONDecodeError as e:
+                            logger.warning(f"Error en línea {line_num}: {e}")
+                            continue
+                    yield data
+    
     def check_api_availability(self) -> bool:
         """
         Verifica que la API RAG esté disponible.
@@ -195,7 +369,13 @@ class RAGEvaluator:
             True si la API está disponible, False en caso contrario
         """
         try:
-            response = requests.get(f"{self.api_url}/docs", timeout=5)
+            # HEAD sin cuerpo; /docs como respaldo para versiones de la API sin /healthz
+            try:
+                response = self.session.head(f"{self.api_url}/healthz", timeout=2)
+                if response.status_code != 200:
+                    response = self.session.head(f"{self.api_url}/docs", timeout=2)
+            except requests.exceptions.RequestException:
+                response = self.session.head(f"{self.api_url}/docs", timeout=2)
             if response.status_code == 200:
                 logger.info("API RAG está disponible")
                 return True
@@ -219,7 +399,7 @@ class RAGEvaluator:
         try:
             start_time = time.time()
             
-            response = requests.post(
+            response = self.session.post(
                 f"{self.api_url}/rag",
                 json={"question": question},
                 timeout=30
@@ -230,23 +410,14 @@ class RAGEvaluator:
             if response.status_code == 200:
                 data = response.json()
                 
-                # Asegurar que context y context_sources sean listas
+                # api_rag.py siempre devuelve listas en context y context_sources
                 context = data.get("context", data.get("relevant_docs", []))
                 context_sources = data.get("context_sources", [])
-                
-                # Si context es string, intentar parsearlo como JSON
-                if isinstance(context, str):
-                    try:
-                        context = json.loads(context)
-                    except:
-                        context = [context]  # Si no se puede parsear, convertir a lista
-                
-                # Si context_sources es string, intentar parsearlo como JSON
-                if isinstance(context_sources, str):
-                    try:
-                        context_sources = json.loads(context_sources)
-                    except:
-                        context_sources = [context_sources]  # Si no se puede parsear, convertir a lista
+                if not isinstance(context, list) or not isinstance(context_sources, list):
+                    raise ValueError(
+                        f"La API debe devolver listas en context/context_sources; "
+                        f"recibido {type(context).__name__}/{type(context_sources).__name__}"
+                    )
                 
                 return {
                     "answer": data.get("answer", ""),
@@ -291,6 +462,84 @@ class RAGEvaluator:
                 "error": str(e)
             }
     
+    async def query_rag_api_async(self, session: "aiohttp.ClientSession", question: str) -> Dict[str, Any]:
+        """
+        Versión asíncrona de query_rag_api sobre una sesión aiohttp compartida.
+        
+        Args:
+            session: Sesión HTTP con pool de conexiones keep-alive
+            question: Pregunta a consultar
+            
+        Returns:
+            Respuesta de la API con answer, context, etc.
+        """
+        import aiohttp
+        
+        try:
+            start_time = time.time()
+            
+            async with session.post(
+                f"{self.api_url}/rag",
+                json={"question": question},
+                timeout=aiohttp.ClientTimeout(total=30)
+            ) as response:
+                api_time = time.time() - start_time
+                
+                if response.status == 200:
+                    data = await response.json()
+                    
+                    # api_rag.py siempre devuelve listas en context y context_sources
+                    context = data.get("context", data.get("relevant_docs", []))
+                    context_sources = data.get("context_sources", [])
+                    if not isinstance(context, list) or not isinstance(context_sources, list):
+                        raise ValueError(
+                            f"La API debe devolver listas en context/context_sources; "
+                            f"recibido {type(context).__name__}/{type(context_sources).__name__}"
+                        )
+                    
+                    return {
+                        "answer": data.get("answer", ""),
+                        "context": context,
+                        "context_sources": context_sources,
+                        "workflow_info": data.get("workflow_info", {}),
+                        "api_time": api_time,
+                        "success": True
+                    }
+                else:
+                    logger.error(f"API error {response.status}: {await response.text()}")
+                    return {
+                        "answer": "",
+                        "context": [],
+                        "context_sources": [],
+                        "workflow_info": {},
+                        "api_time": api_time,
+                        "success": False,
+                        "error": f"HTTP {response.status}"
+                    }
+                    
+        except asyncio.TimeoutError:
+            logger.error("Timeout en consulta API")
+            return {
+                "answer": "",
+                "context": [],
+                "context_sources": [],
+                "workflow_info": {},
+                "api_time": 30.0,
+                "success": False,
+                "error": "Timeout"
+            }
+        except Exception as e:
+            logger.error(f"Error en consulta API: {e}")
+            return {
+                "answer": "",
+                "context": [],
+                "context_sources": [],
+                "workflow_info": {},
+                "api_time": 0.0,
+                "success": False,
+                "error": str(e)
+            }
+    
     def evaluate_single_question(self, question_data: Dict[str, Any]) -> EvaluationResult:
         """
         Evalúa una sola pregunta usando RAGAS.
@@ -301,23 +550,60 @@ class RAGEvaluator:
         Returns:
             Resultado de la evaluación
         """
-        question = question_data["question"]
-        ground_truth = question_data["ground_truth"]
-        question_type = question_data["question_type"]
+        logger.info(f"Evaluando pregunta tipo '{question_data['question_type']}': {question_data['question'][:50]}...")
         
-        logger.info(f"Evaluando pregunta tipo '{question_type}': {question[:50]}...")
+        # Consultar API RAG (o reutilizar la respuesta en caché)
+        self._refresh_index_fingerprint()
+        api_response = self._cached_response(question_data["question"])
+        if api_response is None:
+            api_response = self.query_rag_api(question_data["question"])
+            self._cache_response(question_data["question"], api_response)
         
-        # Consultar API RAG
-        api_response = self.query_rag_api(question)
+        return self._score_rows([(question_data, api_response)])[0]
+    
+    def _score_rows(self, rows: List[Tuple[Dict[str, Any], Dict[str, Any]]]) -> List[EvaluationResult]:
+        """
+        Calcula las métricas RAGAS de varias respuestas con una sola llamada a evaluate().
         
-        if not api_response["success"]:
-            return EvaluationResult(
-                question=question,
+        Args:
+            rows: Pares (datos de la pregunta, respuesta de la API)
+            
+        Returns:
+            Resultados de la evaluación, en el mismo orden que `rows`
+        """
+        results: List[Optional[EvaluationResult]] = [None] * len(rows)
+        scored_rows = []  # Posiciones de las filas con respuesta válida de la API
+        
+        for i, (question_data, api_response) in enumerate(rows):
+            if api_response["success"]:
+                if api_response["answer"].strip() and api_response["context"]:
+                    scored_rows.append(i)
+                    continue
+                # Sin respuesta o sin contexto las métricas solo pueden dar 0: no se
+                # gastan llamadas al LLM evaluador (el reporte lista estos casos)
+                results[i] = EvaluationResult(
+                    question=question_data["question"],
+                    answer=api_response["answer"],
+                    ground_truth=question_data["ground_truth"],
+                    context=api_response["context"],
+                    context_sources=api_response.get("context_sources", []),
+                    question_type=question_data["question_type"],
+                    faithfulness_score=0.0,
+                    answer_relevancy_score=0.0,
+                    context_precision_score=0.0,
+                    context_recall_score=0.0,
+                    answer_correctness_score=0.0,
+                    api_response_time=api_response["api_time"],
+                    evaluation_time=0.0
+                )
+                continue
+            results[i] = EvaluationResult(
+                question=question_data["question"],
                 answer="",
-                ground_truth=ground_truth,
+                ground_truth=question_data["ground_truth"],
                 context=[],
                 context_sources=[],
-                question_type=question_type,
+                question_type=question_data["question_type"],
                 faithfulness_score=0.0,
                 answer_relevancy_score=0.0,
                 context_precision_score=0.0,
@@ -328,132 +614,258 @@ class RAGEvaluator:
                 error=api_response.get("error", "API Error")
             )
         
-        # Preparar datos para RAGAS
-        ragas_data = {
-            "question": [question],
-            "answer": [api_response["answer"]],
-            "ground_truth": [ground_truth],
-            "contexts": [api_response.get("context", api_response.get("relevant_docs", []))]
-        }
+        if not scored_rows:
+            return results
+        
+        from ragas import evaluate
+        from ragas.run_config import RunConfig
+        import pyarrow as pa
+        from datasets import Dataset
+        
+        # Preparar datos para RAGAS (una fila por pregunta)
+        ragas_data = {"question": [], "answer": [], "ground_truth": [], "contexts": []}
+        for i in scored_rows:
+            question_data, api_response = rows[i]
+            ragas_data["question"].append(question_data["question"])
+            ragas_data["answer"].append(api_response["answer"])
+            ragas_data["ground_truth"].append(question_data["ground_truth"])
+            ragas_data["contexts"].append(api_response.get("context", api_response.get("relevant_docs", [])))
         
         try:
             # Evaluar con RAGAS
             eval_start = time.time()
             
-            # Crear Dataset de Hugging Face para RAGAS 0.3.2
-            dataset = Dataset.from_dict(ragas_data)
+            # Crear Dataset de Hugging Face para RAGAS 0.3.2 sobre una tabla Arrow con
+            # esquema explícito (evita inferir tipos en cada lote)
+            schema = ragas_schema()
+            table = pa.Table.from_arrays(
+                [pa.array(ragas_data[field.name], type=field.type) for field in schema],
+                schema=schema
+            )
+            dataset = Dataset(table)
             
-            # Ejecutar evaluación
+            # Las métricas de cada fila son llamadas independientes al LLM: se lanzan en paralelo
+            max_workers = self.ragas_max_workers or min(32, len(self.metrics) * len(scored_rows))
+            
+            # Ejecutar evaluación de todas las filas a la vez; las métricas que fallen quedan en NaN
             result = evaluate(
                 dataset,
                 metrics=self.metrics,
                 llm=self.mistral_llm,
                 embeddings=self.ollama_embeddings,
+                raise_exceptions=False,
+                run_config=RunConfig(max_workers=max_workers),
                 show_progress=False
             )
             
-            eval_time = time.time() - eval_start
+            # Tiempo de evaluación repartido entre las filas del lote
+            eval_time = (time.time() - eval_start) / len(scored_rows)
             
-            # Extraer scores del resultado
-            scores_raw = result.scores if hasattr(result, 'scores') else {}
+            # RAGAS devuelve una lista de diccionarios, uno por fila del dataset
+            scores_raw = result.scores if hasattr(result, 'scores') else []
+            if isinstance(scores_raw, dict):
+                scores_raw = [scores_raw]
             
-            # RAGAS devuelve una lista de diccionarios, necesitamos el primer elemento
-            if isinstance(scores_raw, list) and len(scores_raw) > 0:
-                scores = scores_raw[0]
-            elif isinstance(scores_raw, dict):
-                scores = scores_raw
-            else:
-                scores = {}
-            
-            logger.info(f"Scores extraídos: {scores}")
-            logger.info(f"Tipo de scores: {type(scores)}")
-            
-            return EvaluationResult(
-                question=question,
-                answer=api_response["answer"],
-                ground_truth=ground_truth,
-                context=api_response["context"],
-                context_sources=api_response.get("context_sources", []),
-                question_type=question_type,
-                faithfulness_score=scores.get("faithfulness", 0.0) if isinstance(scores, dict) else 0.0,
-                answer_relevancy_score=scores.get("answer_relevancy", 0.0) if isinstance(scores, dict) else 0.0,
-                context_precision_score=scores.get("context_precision", 0.0) if isinstance(scores, dict) else 0.0,
-                context_recall_score=scores.get("context_recall", 0.0) if isinstance(scores, dict) else 0.0,
-                answer_correctness_score=scores.get("answer_correctness", 0.0) if isinstance(scores, dict) else 0.0,
-                api_response_time=api_response["api_time"],
-                evaluation_time=eval_time
-            )
+            for position, i in enumerate(scored_rows):
+                question_data, api_response = rows[i]
+                scores = scores_raw[position] if position < len(scores_raw) else {}
+                if not isinstance(scores, dict):
+                    scores = {}
+                
+                logger.info(f"Scores extraídos: {scores}")
+                
+                results[i] = EvaluationResult(
+                    question=question_data["question"],
+                    answer=api_response["answer"],
+                    ground_truth=question_data["ground_truth"],
+                    context=api_response["context"],
+                    context_sources=api_response.get("context_sources", []),
+                    question_type=question_data["question_type"],
+                    faithfulness_score=scores.get("faithfulness", 0.0),
+                    answer_relevancy_score=scores.get("answer_relevancy", 0.0),
+                    context_precision_score=scores.get("context_precision", 0.0),
+                    context_recall_score=scores.get("context_recall", 0.0),
+                    answer_correctness_score=scores.get("answer_correctness", 0.0),
+                    api_response_time=api_response["api_time"],
+                    evaluation_time=eval_time
+                )
             
         except Exception as e:
             logger.error(f"Error en evaluación RAGAS: {e}")
-            return EvaluationResult(
-                question=question,
-                answer=api_response["answer"],
-                ground_truth=ground_truth,
-                context=api_response["context"],
-                context_sources=api_response.get("context_sources", []),
-                question_type=question_type,
-                faithfulness_score=0.0,
-                answer_relevancy_score=0.0,
-                context_precision_score=0.0,
-                context_recall_score=0.0,
-                answer_correctness_score=0.0,
-                api_response_time=api_response["api_time"],
-                evaluation_time=0.0,
-                error=str(e)
-            )
+            for i in scored_rows:
+                question_data, api_response = rows[i]
+                results[i] = EvaluationResult(
+                    question=question_data["question"],
+                    answer=api_response["answer"],
+                    ground_truth=question_data["ground_truth"],
+                    context=api_response["context"],
+                    context_sources=api_response.get("context_sources", []),
+                    question_type=question_data["question_type"],
+                    faithfulness_score=0.0,
+                    answer_relevancy_score=0.0,
+                    context_precision_score=0.0,
+                    context_recall_score=0.0,
+                    answer_correctness_score=0.0,
+                    api_response_time=api_response["api_time"],
+                    evaluation_time=0.0,
+                    error=str(e)
+                )
+        
+        return results
     
-    def evaluate_batch(self, questions: List[Dict[str, Any]], batch_size: int = 5) -> List[EvaluationResult]:
+    @staticmethod
+    def _row_length(row: Tuple[Dict[str, Any], Dict[str, Any]]) -> int:
+        """Longitud de una fila RAGAS (pregunta + respuesta + contextos), en caracteres"""
+        question_data, api_response = row
+        return (len(question_data["question"])
+                + len(api_response.get("answer", ""))
+                + sum(len(text) for text in api_response.get("context", [])))
+    
+    def _score_and_checkpoint(self, rows: List[Tuple[Dict[str, Any], Dict[str, Any]]]) -> List[EvaluationResult]:
+        """Calcula RAGAS para un lote de filas y guarda los resultados exitosos en el checkpoint"""
+        results = self._score_rows(rows)
+        self._save_checkpoint(results)
+        return results
+    
+    def _save_checkpoint(self, results: List[EvaluationResult]):
+        """Añade los resultados exitosos al checkpoint (uno por línea, con la huella del índice)"""
+        for result in results:
+            if not result.error:
+                row = {"index_fingerprint": self._index_fingerprint, **asdict(result)}
+                self._checkpoint_file.write(orjson.dumps(row).decode('utf-8') + "\n")
+    
+    def load_checkpoint(self, questions: Optional[Set[str]] = None) -> List[EvaluationResult]:
         """
-        Evalúa un lote de preguntas.
+        Carga los resultados guardados por una ejecución interrumpida.
+        
+        Se descartan las filas evaluadas contra otro índice (huella distinta de
+        la actual) y, si se indica `questions`, las que ya no están en el dataset.
         
         Args:
-            questions: Lista de preguntas a evaluar
-            batch_size: Tamaño del lote
+            questions: Preguntas del dataset actual
             
         Returns:
-            Lista de resultados de evaluación
+            Lista de resultados exitosos ya evaluados
         """
-        results = []
-        total_questions = len(questions)
+        if not self.checkpoint_path.exists():
+            return []
         
-        logger.info(f"Evaluando lote de {total_questions} preguntas en grupos de {batch_size}")
+        # orjson guarda NaN como null; se restaura para las métricas numéricas
+        float_fields = [f.name for f in fields(EvaluationResult) if f.type is float]
+        completed = []
+        stale = 0
+        with open(self.checkpoint_path, 'rb') as f:
+            for line_num, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    row = orjson.loads(line)
+                except orjson.JSONDecodeError as e:
+                    # Una línea incompleta indica que la ejecución se cortó al escribirla
+                    logger.warning(f"Checkpoint: error en línea {line_num}: {e}")
+                    continue
+                if row.pop("index_fingerprint", None) != self._index_fingerprint:
+                    stale += 1
+                    continue
+                if questions is not None and row.get("question") not in questions:
+                    stale += 1
+                    continue
+                for name in float_fields:
+                    if row.get(name) is None:
+                        row[name] = float("nan")
+                completed.append(EvaluationResult(**row))
+        
+        if stale:
+            logger.info(f"Checkpoint: {stale} resultados descartados (otro índice o fuera del dataset)")
+        return completed
+    
+    async def evaluate_batch(self, questions: Iterable[Dict[str, Any]], concurrency: int = 8,
+                             ragas_batch_size: int = 16) -> List[EvaluationResult]:
+        """
+        Evalúa un lote de preguntas en un pipeline productor/consumidor.
+        
+        Productores: consultan la API con varias preguntas en vuelo a la vez y
+        dejan cada respuesta en una cola.
+        Consumidor: calcula las métricas RAGAS por lotes mientras siguen llegando
+        respuestas, de modo que ambas fases se solapan.
         
-        for i in range(0, total_questions, batch_size):
-            batch = questions[i:i + batch_size]
-            batch_num = i // batch_size + 1
-            total_batches = (total_questions + batch_size - 1) // batch_size
+        Args:
+            questions: Preguntas a evaluar (lista o iterador, p. ej. iter_dataset())
+            concurrency: Máximo de consultas simultáneas a la API
+            ragas_batch_size: Filas por llamada a evaluate()
             
-            logger.info(f"Procesando lote {batch_num}/{total_batches} ({len(batch)} preguntas)")
+        Returns:
+            Lista de resultados de evaluación, en el orden de `questions`
+        """
+        import aiohttp
+        
+        questions = list(questions)
+        total_questions = len(questions)
+        results: List[Optional[EvaluationResult]] = [None] * total_questions
+        
+        logger.info(f"Evaluando lote de {total_questions} preguntas con hasta {concurrency} consultas simultáneas")
+        
+        # El semáforo limita la carga sobre la API (reemplaza la pausa fija entre preguntas)
+        semaphore = asyncio.Semaphore(concurrency)
+        connector = aiohttp.TCPConnector(limit=concurrency, keepalive_timeout=60)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=2 * ragas_batch_size)
+        
+        async def produce(row_id: int, question_data: Dict[str, Any]):
+            cached = self._cached_response(question_data["question"])
+            if cached is not None:
+                logger.info(f"Respuesta en caché para: {question_data['question'][:50]}...")
+                await queue.put((row_id, (question_data, cached)))
+                return
             
-            for question_data in batch:
+            async with semaphore:
+                logger.info(f"Consultando pregunta tipo '{question_data['question_type']}': {question_data['question'][:50]}...")
                 try:
-                    result = self.evaluate_single_question(question_data)
-                    results.append(result)
-                    
-                    # Pequeña pausa entre preguntas para no sobrecargar la API
-                    time.sleep(1)
-                    
+                    api_response = await self.query_rag_api_async(session, question_data["question"])
                 except Exception as e:
                     logger.error(f"Error procesando pregunta: {e}")
-                    # Crear resultado de error
-                    error_result = EvaluationResult(
-                        question=question_data["question"],
-                        answer="",
-                        ground_truth=question_data["ground_truth"],
-                        context=[],
-                        context_sources=[],
-                        question_type=question_data["question_type"],
-                        faithfulness_score=0.0,
-                        answer_relevancy_score=0.0,
-                        context_precision_score=0.0,
-                        context_recall_score=0.0,
-                        answer_correctness_score=0.0,
-                        api_response_time=0.0,
-                        evaluation_time=0.0,
-                        error=str(e)
-                    )
-                    results.append(error_result)
+                    api_response = {
+                        "answer": "",
+                        "context": [],
+                        "context_sources": [],
+                        "workflow_info": {},
+                        "api_time": 0.0,
+                        "success": False,
+                        "error": str(e)
+                    }
+            self._cache_response(question_data["question"], api_response)
+            await queue.put((row_id, (question_data, api_response)))
+        
+        async def score(batch: List[Tuple[int, Tuple[Dict[str, Any], Dict[str, Any]]]]):
+            logger.info(f"Calculando métricas RAGAS para {len(batch)} respuestas...")
+            # RAGAS es síncrono, se ejecuta en un hilo para no bloquear el event loop
+            batch_results = await asyncio.to_thread(self._score_and_checkpoint, [row for _, row in batch])
+            for (row_id, _), result in zip(batch, batch_results):
+                results[row_id] = result
+        
+        async def consume():
+            pending = []
+            for _ in range(total_questions):
+                pending.append(await queue.get())
+                # Con margen de sobra, evaluar las filas más cortas: cada lote agrupa
+                # longitudes parecidas y no espera a una fila mucho más larga
+                if len(pending) >= 2 * ragas_batch_size:
+                    pending.sort(key=lambda item: self._row_length(item[1]))
+                    batch, pending = pending[:ragas_batch_size], pending[ragas_batch_size:]
+                    await score(batch)
+            
+            pending.sort(key=lambda item: self._row_length(item[1]))
+            for start in range(0, len(pending), ragas_batch_size):
+                await score(pending[start:start + ragas_batch_size])
+        
+        # La caché de respuestas solo vale para el índice que la API sirve ahora
+        await asyncio.to_thread(self._refresh_index_fingerprint)
+        
+        async with aiohttp.ClientSession(connector=connector) as session:
+            await asyncio.gather(
+                consume(),
+                *(produce(row_id, question_data) for row_id, question_data in enumerate(questions))
+            )
         
         return results
     
@@ -464,53 +876,35 @@ class RAGEvaluator:
         Returns:
             Diccionario con métricas por tipo
         """
-        type_metrics = {}
+        import numpy as np
         
-        for result in self.results:
-            if result.error:
-                continue
-                
-            question_type = result.question_type
-            
-            if question_type not in type_metrics:
-                type_metrics[question_type] = {
-                    "faithfulness": [],
-                    "answer_relevancy": [],
-                    "context_precision": [],
-                    "context_recall": [],
-                    "answer_correctness": [],
-                    "api_response_time": [],
-                    "evaluation_time": []
-                }
+        valid_results = [r for r in self.results if not r.error]
+        
+        # Tipos en orden de primera aparición
+        type_index = {t: i for i, t in enumerate(dict.fromkeys(r.question_type for r in valid_results))}
+        type_ids = np.fromiter((type_index[r.question_type] for r in valid_results), dtype=np.int64, count=len(valid_results))
+        scores = np.array(
+            [[getattr(r, field) for field in _TYPE_METRIC_FIELDS.values()] for r in valid_results],
+            dtype=np.float64
+        ).reshape(len(valid_results), len(_TYPE_METRIC_FIELDS))
+        
+        type_metrics = {}
+        for question_type, type_id in type_index.items():
+            type_scores = scores[type_ids == type_id]
+            # Los valores NaN se ignoran; una métrica sin valores válidos queda en 0.0
+            has_values = ~np.isnan(type_scores).all(axis=0)
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", category=RuntimeWarning)
+                avgs = np.where(has_values, np.nanmean(type_scores, axis=0), 0.0)
+                mins = np.where(has_values, np.nanmin(type_scores, axis=0), 0.0)
+                maxs = np.where(has_values, np.nanmax(type_scores, axis=0), 0.0)
             
-            type_metrics[question_type]["faithfulness"].append(result.faithfulness_score)
-            type_metrics[question_type]["answer_relevancy"].append(result.answer_relevancy_score)
-            type_metrics[question_type]["context_precision"].append(result.context_precision_score)
-            type_metrics[question_type]["context_recall"].append(result.context_recall_score)
-            type_metrics[question_type]["answer_correctness"].append(result.answer_correctness_score)
-            type_metrics[question_type]["api_response_time"].append(result.api_response_time)
-            type_metrics[question_type]["evaluation_time"].append(result.evaluation_time)
-        
-        # Calcular promedios
-        for question_type in type_metrics:
-            metrics = type_metrics[question_type]
-            for metric_name, values in list(metrics.items()):
-                if values:
-                    # Filtrar valores NaN antes de calcular estadísticas
-                    valid_values = [v for v in values if not math.isnan(v)]
-                    
-                    if valid_values:
-                        type_metrics[question_type][f"{metric_name}_avg"] = sum(valid_values) / len(valid_values)
-                        type_metrics[question_type][f"{metric_name}_min"] = min(valid_values)
-                        type_metrics[question_type][f"{metric_name}_max"] = max(valid_values)
-                    else:
-                        type_metrics[question_type][f"{metric_name}_avg"] = 0.0
-                        type_metrics[question_type][f"{metric_name}_min"] = 0.0
-                        type_metrics[question_type][f"{metric_name}_max"] = 0.0
-                else:
-                    type_metrics[question_type][f"{metric_name}_avg"] = 0.0
-                    type_metrics[question_type][f"{metric_name}_min"] = 0.0
-                    type_metrics[question_type][f"{metric_name}_max"] = 0.0
+            metrics = {name: type_scores[:, j].tolist() for j, name in enumerate(_TYPE_METRIC_FIELDS)}
+            for j, name in enumerate(_TYPE_METRIC_FIELDS):
+                metrics[f"{name}_avg"] = float(avgs[j])
+                metrics[f"{name}_min"] = float(mins[j])
+                metrics[f"{name}_max"] = float(maxs[j])
+            type_metrics[question_type] = metrics
         
         return type_metrics
     
@@ -545,21 +939,26 @@ class RAGEvaluator:
         
         # Métricas generales
         if successful_evaluations > 0:
-            # Filtrar valores válidos (no NaN) para cada métrica
-            valid_faithfulness = [r.faithfulness_score for r in self.results if not r.error and not math.isnan(r.faithfulness_score)]
-            valid_answer_relevancy = [r.answer_relevancy_score for r in self.results if not r.error and not math.isnan(r.answer_relevancy_score)]
-            valid_context_precision = [r.context_precision_score for r in self.results if not r.error and not math.isnan(r.context_precision_score)]
-            valid_context_recall = [r.context_recall_score for r in self.results if not r.error and not math.isnan(r.context_recall_score)]
-            valid_answer_correctness = [r.answer_correctness_score for r in self.results if not r.error and not math.isnan(r.answer_correctness_score)]
-            valid_api_times = [r.api_response_time for r in self.results if not r.error and not math.isnan(r.api_response_time)]
+            # Sumar valores válidos (no NaN) de todas las métricas en una sola pasada
+            sums = defaultdict(float)
+            counts = defaultdict(int)
+            for r in self.results:
+                if r.error:
+                    continue
+                for name in _REPORT_METRIC_FIELDS:
+                    value = getattr(r, name)
+                    if not math.isnan(value):
+                        sums[name] += value
+                        counts[name] += 1
             
             # Calcular promedios solo con valores válidos
-            avg_faithfulness = sum(valid_faithfulness) / len(valid_faithfulness) if valid_faithfulness else 0.0
-            avg_answer_relevancy = sum(valid_answer_relevancy) / len(valid_answer_relevancy) if valid_answer_relevancy else 0.0
-            avg_context_precision = sum(valid_context_precision) / len(valid_context_precision) if valid_context_precision else 0.0
-            avg_context_recall = sum(valid_context_recall) / len(valid_context_recall) if valid_context_recall else 0.0
-            avg_answer_correctness = sum(valid_answer_correctness) / len(valid_answer_correctness) if valid_answer_correctness else 0.0
-            avg_api_time = sum(valid_api_times) / len(valid_api_times) if valid_api_times else 0.0
+            averages = {name: sums[name] / counts[name] if counts[name] else 0.0 for name in _REPORT_METRIC_FIELDS}
+            avg_faithfulness = averages["faithfulness_score"]
+            avg_answer_relevancy = averages["answer_relevancy_score"]
+            avg_context_precision = averages["context_precision_score"]
+            avg_context_recall = averages["context_recall_score"]
+            avg_answer_correctness = averages["answer_correctness_score"]
+            avg_api_time = averages["api_response_time"]
             
             report.append("MÉTRICAS GENERALES")
             report.append("-" * 40)
@@ -597,6 +996,13 @@ class RAGEvaluator:
             for result in low_scores[:5]:  # Mostrar solo los primeros 5
                 report.append(f"  - {result.question[:60]}... (Score: {result.faithfulness_score:.3f})")
         
+        # Respuestas vacías o sin contexto (puntuadas con 0 sin pasar por RAGAS)
+        empty_responses = [r for r in self.results if not r.error and (not r.answer.strip() or not r.context)]
+        if empty_responses:
+            report.append(f"\nRespuestas vacías o sin contexto ({len(empty_responses)} casos, puntuadas con 0):")
+            for result in empty_responses[:5]:  # Mostrar solo los primeros 5
+                report.append(f"  - {result.question[:60]}...")
+        
         # Errores
         if failed_evaluations > 0:
             report.append(f"\nErrores encontrados ({failed_evaluations} casos):")
@@ -632,73 +1038,92 @@ class RAGEvaluator:
         
         return "\n".join(report)
     
-    def export_results(self, output_dir: str = "evaluation_results"):
+    def export_results(self, output_dir: str = "evaluation_results", report: Optional[str] = None):
         """
-        Exporta los resultados a archivos CSV y JSON.
+        Exporta los resultados a CSV y JSON Lines (una fila por pregunta) y un
+        resumen JSON con los metadatos y las métricas por tipo.
         
         Args:
             output_dir: Directorio donde guardar los resultados
+            report: Reporte ya generado con generate_report (se genera si no se pasa)
         """
         output_path = Path(output_dir)
         output_path.mkdir(exist_ok=True)
         
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         
-        # Exportar a CSV
-        csv_data = []
-        for result in self.results:
-            csv_data.append({
-                "question": result.question,
-                "answer": result.answer,
-                "ground_truth": result.ground_truth,
-                "question_type": result.question_type,
-                "faithfulness_score": result.faithfulness_score,
-                "answer_relevancy_score": result.answer_relevancy_score,
-                "context_precision_score": result.context_precision_score,
-                "context_recall_score": result.context_recall_score,
-                "answer_correctness_score": result.answer_correctness_score,
-                "api_response_time": result.api_response_time,
-                "evaluation_time": result.evaluation_time,
-                "context": " | ".join(result.context) if result.context else "",
-                "context_sources": json.dumps(result.context_sources, ensure_ascii=False) if result.context_sources else "",
-                "error": result.error or ""
-            })
-        
-        df = pd.DataFrame(csv_data)
+        # Exportar a CSV y JSON Lines fila a fila, sin acumular las filas en memoria
+        csv_fields = [
+            "question", "answer", "ground_truth", "question_type",
+            "faithfulness_score", "answer_relevancy_score", "context_precision_score",
+            "context_recall_score", "answer_correctness_score",
+            "api_response_time", "evaluation_time", "context", "context_sources", "error"
+        ]
+        failed_evaluations = 0
         csv_file = output_path / f"evaluation_results_{timestamp}.csv"
-        df.to_csv(csv_file, index=False, encoding='utf-8')
+        jsonl_file = output_path / f"evaluation_results_{timestamp}.jsonl"
+        with open(csv_file, 'w', newline='', encoding='utf-8') as f, open(jsonl_file, 'wb') as jsonl:
+            writer = csv.DictWriter(f, fieldnames=csv_fields)
+            writer.writeheader()
+            for result in self.results:
+                row = {
+                    "question": result.question,
+                    "answer": result.answer,
+                    "ground_truth": result.ground_truth,
+                    "question_type": result.question_type,
+                    "faithfulness_score": result.faithfulness_score,
+                    "answer_relevancy_score": result.answer_relevancy_score,
+                    "context_precision_score": result.context_precision_score,
+                    "context_recall_score": result.context_recall_score,
+                    "answer_correctness_score": result.answer_correctness_score,
+                    "api_response_time": result.api_response_time,
+                    "evaluation_time": result.evaluation_time,
+                    "context": " | ".join(result.context) if result.context else "",
+                    "context_sources": orjson.dumps(result.context_sources).decode('utf-8') if result.context_sources else "",
+                    "error": result.error or ""
+                }
+                # Celdas vacías para NaN, como hacía pandas
+                writer.writerow({k: "" if isinstance(v, float) and math.isnan(v) else v for k, v in row.items()})
+                # orjson escribe NaN/Inf como null
+                jsonl.write(orjson.dumps(row, option=orjson.OPT_APPEND_NEWLINE))
+                if result.error:
+                    failed_evaluations += 1
         logger.info(f"Resultados exportados a CSV: {csv_file}")
+        logger.info(f"Resultados exportados a JSON Lines: {jsonl_file}")
         
-        # Exportar a JSON
+        # Exportar resumen a JSON
         json_data = {
             "evaluation_metadata": {
                 "timestamp": timestamp,
                 "total_questions": len(self.results),
-                "successful_evaluations": len([r for r in self.results if not r.error]),
-                "failed_evaluations": len([r for r in self.results if r.error])
+                "successful_evaluations": len(self.results) - failed_evaluations,
+                "failed_evaluations": failed_evaluations
             },
-            "results": csv_data,
+            "results_file": jsonl_file.name,
             "metrics_by_type": self.calculate_metrics_by_type()
         }
         
         json_file = output_path / f"evaluation_results_{timestamp}.json"
-        with open(json_file, 'w', encoding='utf-8') as f:
-            # Usar serialización JSON segura para evitar valores NaN
-            json.dump(json_data, f, indent=2, ensure_ascii=False, default=safe_json_serializer)
-        logger.info(f"Resultados exportados a JSON: {json_file}")
+        with open(json_file, 'wb') as f:
+            # orjson escribe NaN/Inf como null y serializa arrays de NumPy
+            f.write(orjson.dumps(
+                json_data,
+                option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY
+            ))
+        logger.info(f"Resumen exportado a JSON: {json_file}")
         
         # Guardar reporte
         report_file = output_path / f"evaluation_report_{timestamp}.txt"
         with open(report_file, 'w', encoding='utf-8') as f:
-            f.write(self.generate_report())
+            f.write(report if report is not None else self.generate_report())
         logger.info(f"Reporte guardado: {report_file}")
     
-    def run_evaluation(self, batch_size: int = 5):
+    def run_evaluation(self, concurrency: int = 8):
         """
         Ejecuta la evaluación completa.
         
         Args:
-            batch_size: Tamaño del lote para procesamiento
+            concurrency: Máximo de preguntas procesándose simultáneamente
         """
         logger.info("Iniciando evaluación RAG con RAGAS")
         
@@ -708,17 +1133,23 @@ class RAGEvaluator:
             logger.info("Por favor, ejecuta en otra terminal: cd src/evaluation && python api_rag.py")
             return
         
-        # Cargar dataset
-        try:
-            dataset = self.load_dataset()
-            logger.info(f"Dataset cargado: {len(dataset)} preguntas")
-        except Exception as e:
-            logger.error(f"Error cargando dataset: {e}")
+        # Verificar dataset (se lee línea a línea al despachar las preguntas)
+        if self._dataset is None and not Path(self.dataset_path).is_file():
+            logger.error(f"Dataset no encontrado: {self.dataset_path}")
             return
         
+        # Retomar una ejecución interrumpida: no repetir preguntas ya evaluadas con éxito
+        # contra el mismo índice y que sigan en el dataset
+        self._refresh_index_fingerprint()
+        completed = self.load_checkpoint({question_data["question"] for question_data in self.iter_dataset()})
+        done = {result.question for result in completed}
+        if completed:
+            logger.info(f"Checkpoint encontrado: {len(completed)} preguntas ya evaluadas")
+        
         # Ejecutar evaluación
         logger.info("Iniciando evaluación de preguntas...")
-        self.results = self.evaluate_batch(dataset, batch_size)
+        pending = (question_data for question_data in self.iter_dataset() if question_data["question"] not in done)
+        self.results = completed + asyncio.run(self.evaluate_batch(pending, concurrency))
         
         # Generar reporte
         logger.info("Generando reporte...")
@@ -727,12 +1158,25 @@ class RAGEvaluator:
         
         # Exportar resultados
         logger.info("Exportando resultados...")
-        self.export_results()
+        self.export_results(report=report)
+        
+        # Evaluación completa y exportada: la próxima ejecución empieza de cero
+        self._checkpoint_file.truncate(0)
+        self.mistral_llm.clear_memory()
         
         logger.info("Evaluación completada exitosamente")
 
 def main():
     """Función principal"""
+    parser = argparse.ArgumentParser(description="Evaluación RAG con RAGAS")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Consultar la API para todas las preguntas, sin reutilizar respuestas en caché")
+    parser.add_argument("--max-workers", type=int, default=None,
+                        help="Llamadas simultáneas de RAGAS al LLM (por defecto: métricas × filas, hasta 32)")
+    parser.add_argument("--concurrency", type=int, default=3,
+                        help="Consultas simultáneas a la API RAG (por defecto: 3, pocas para estabilidad)")
+    args = parser.parse_args()
+    
     print("🚀 Iniciando Evaluación RAG con RAGAS")
     print("=" * 50)
     
@@ -743,65 +1187,15 @@ def main():
         return
     
     # Crear evaluador
-    evaluator = RAGEvaluator()
-    
-    # Ejecutar evaluación
-    try:
-        evaluator.run_evaluation(batch_size=3)  # Lotes pequeños para estabilidad
-    except KeyboardInterrupt:
-        print("\n⏹️  Evaluación interrumpida por el usuario")
-    except Exception as e:
-        print(f"❌ Error durante la evaluación: {e}")
-        logger.error(f"Error en evaluación: {e}")
-
-def safe_json_serializer(obj):
-    """
-    Serializador JSON seguro que convierte valores problemáticos a null.
-    
-    Args:
-        obj: Objeto a serializar
-        
-    Returns:
-        Objeto serializable o None para valores problemáticos
-    """
-    if isinstance(obj, float):
-        if math.isnan(obj):
-            return None  # NaN -> null
-        elif math.isinf(obj):
-            return None  # Inf -> null
-    return obj
-
-def safe_json_dumps(data, **kwargs):
-    """
-    Función wrapper para json.dumps con manejo seguro de valores nulos.
-    
-    Args:
-        data: Datos a serializar
-        **kwargs: Argumentos adicionales para json.dumps
-        
-    Returns:
-        String JSON con valores nulos seguros
-    """
-    return json.dumps(data, default=safe_json_serializer, **kwargs)
-
-def clean_data_for_json(data):
-    """
-    Limpia datos recursivamente para serialización JSON segura.
-    
-    Args:
-        data: Datos a limpiar (dict, list, o cualquier tipo)
-        
-    Returns:
-        Datos limpios sin valores NaN o Inf
-    """
-    if isinstance(data, dict):
-        return {k: clean_data_for_json(v) for k, v in data.items()}
-    elif isinstance(data, list):
-        return [clean_data_for_json(item) for item in data]
-    elif isinstance(data, float):
-        if math.isnan(data) or math.isinf(data):
-            return None
-    return data
+    with RAGEvaluator(use_response_cache=not args.no_cache, ragas_max_workers=args.max_workers) as evaluator:
+        # Ejecutar evaluación
+        try:
+            evaluator.run_evaluation(concurrency=args.concurrency)
+        except KeyboardInterrupt:
+            print("\n⏹️  Evaluación interrumpida por el usuario")
+        except Exception as e:
+            print(f"❌ Error durante la evaluación: {e}")
+            logger.error(f"Error en evaluación: {e}")
 
 if __name__ == "__main__":
     main()
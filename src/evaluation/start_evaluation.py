@@ -13,7 +13,9 @@ import os
 import sys
 import time
 import subprocess
-import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
 from pathlib import Path
 
 def check_services():
@@ -28,26 +30,35 @@ def check_services():
     
     import requests
     
-    for service_name, url in services.items():
+    def probe(service_name, url):
         try:
             if service_name == "Qdrant":
                 response = requests.get(f"{url}/collections", timeout=5)
             elif service_name == "Ollama":
                 response = requests.get(f"{url}/api/tags", timeout=5)
-            else:  # API RAG
-                response = requests.get(f"{url}/docs", timeout=5)
+            else:  # API RAG: /healthz, con /docs como respaldo para versiones sin /healthz
+                response = requests.head(f"{url}/healthz", timeout=5)
+                if response.status_code != 200:
+                    response = requests.head(f"{url}/docs", timeout=5)
             
             if response.status_code == 200:
-                print(f"✅ {service_name} está funcionando")
-            else:
-                print(f"⚠️  {service_name} respondió con código {response.status_code}")
-                return False
+                return True, f"✅ {service_name} está funcionando"
+            return False, f"⚠️  {service_name} respondió con código {response.status_code}"
                 
         except requests.exceptions.RequestException:
-            print(f"❌ {service_name} no está disponible en {url}")
-            return False
+            return False, f"❌ {service_name} no está disponible en {url}"
+    
+    # Sondear todos los servicios a la vez: la espera total es la del más lento
+    with ThreadPoolExecutor(max_workers=len(services)) as executor:
+        futures = {name: executor.submit(probe, name, url) for name, url in services.items()}
+    
+    all_ok = True
+    for service_name, future in futures.items():
+        ok, message = future.result()
+        print(message)
+        all_ok = all_ok and ok
     
-    return True
+    return all_ok
 
 def start_api_rag():
     """Inicia la API RAG en segundo plano"""
@@ -62,27 +73,44 @@ def start_api_rag():
             [sys.executable, "api_rag.py"],
             cwd=eval_dir,
             stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
+            stderr=subprocess.STDOUT,
+            bufsize=1,
+            text=True
         )
         
-        # Esperar un poco para que inicie
-        time.sleep(3)
+        # Vaciar la salida en un hilo para que el proceso no se bloquee con el pipe lleno;
+        # se conservan las últimas líneas para mostrarlas si el arranque falla
+        recent_output = deque(maxlen=20)
+        output_reader = threading.Thread(
+            target=lambda: recent_output.extend(process.stdout),
+            daemon=True
+        )
+        output_reader.start()
         
-        # Verificar que esté funcionando
+        # Esperar a que responda, con reintentos cada vez más espaciados (~15 s en total)
         import requests
-        try:
-            response = requests.get("http://localhost:8001/docs", timeout=5)
-            if response.status_code == 200:
-                print("✅ API RAG iniciada correctamente")
-                return process
-            else:
-                print("❌ API RAG no respondió correctamente")
-                process.terminate()
+        delay = 0.1
+        for _ in range(30):
+            if process.poll() is not None:
+                print(f"❌ API RAG terminó al iniciar (código {process.returncode})")
+                # Dejar que el hilo lea las últimas líneas antes de mostrarlas
+                output_reader.join(timeout=2)
+                for line in list(recent_output):
+                    print(f"   {line.rstrip()}")
                 return None
-        except requests.exceptions.RequestException:
-            print("❌ No se pudo conectar a la API RAG")
-            process.terminate()
-            return None
+            try:
+                response = requests.head("http://localhost:8001/healthz", timeout=0.5)
+                if response.status_code == 200:
+                    print("✅ API RAG iniciada correctamente")
+                    return process
+            except requests.exceptions.RequestException:
+                pass
+            time.sleep(delay)
+            delay = min(delay * 1.5, 1.0)
+        
+        print("❌ No se pudo conectar a la API RAG")
+        process.terminate()
+        return None
             
     except Exception as e:
         print(f"❌ Error iniciando API RAG: {e}")
@@ -133,9 +161,6 @@ def main():
             print("❌ No se pudo iniciar la API RAG")
             return False
         
-        # Esperar un poco más
-        time.sleep(2)
-        
         # Verificar nuevamente
         if not check_services():
             print("❌ Los servicios siguen sin estar disponibles")
@@ -1,12 +1,15 @@
 # src/ui/app.py
-import os, sys
+import os, re, sys
+import asyncio
 from pathlib import Path
+from types import SimpleNamespace
 sys.path.append(os.path.join(os.path.dirname(__file__), "../"))
 
 import chainlit as cl
 from llm.mistral_llm import MistralLLM
 from translation.translate import translate_text
 from embeddings.embedding_qdrant import EmbeddingControllerQdrant
+from cache.semantic_cache import SemanticCache, FRONTEND_CACHE_COLLECTION_NAME
 from dotenv import load_dotenv
 from config.display_config import (
     get_display_config, get_emoji, get_relevance_icon, 
@@ -22,20 +25,18 @@ load_dotenv(project_root / '.env')
 # Load display configuration
 DISPLAY_CONFIG = get_display_config()
 
+# Source display settings, read once instead of on every message
+_MAX_SOURCES = DISPLAY_CONFIG["source_display"].get("max_sources_displayed", 5)
+_SOURCES_HEADER = DISPLAY_CONFIG["source_formatting"].get("header", "### **Fuentes consultadas**\n")
+
 def format_sources_for_display(context_results):
     if not context_results:  # Just check if the list is empty
         return DISPLAY_CONFIG["error_messages"]["no_sources"]
     
     try:
-        # Limit sources based on configuration
-        max_sources = DISPLAY_CONFIG["source_display"].get("max_sources_displayed", 5)
-        matches = context_results[:max_sources]  # Slice the list directly
-        
-        # Create a clean sources display with markdown
-        sources_text = DISPLAY_CONFIG["source_formatting"].get("header", "### **Fuentes consultadas**\n")
-        
-        # Add sources as a clean numbered list
-        for i, match in enumerate(matches, 1):
+        # Add sources as a clean numbered list, limited by configuration
+        lines = [_SOURCES_HEADER]
+        for i, match in enumerate(context_results[:_MAX_SOURCES], 1):
             metadata = match.payload
             
             # Extract metadata safely with defaults
@@ -45,15 +46,12 @@ def format_sources_for_display(context_results):
             header_info = f" - {header}" if header else ""
             
             # Calculate score percentage
-            score = float(match.score)  # Ensure score is float
-            score_percentage = int(score * 100)
+            score_percentage = int(float(match.score) * 100)
             relevance_icon = get_relevance_icon(score_percentage)
             
-            # Format source line using template
-            source_line = f"{i}. {relevance_icon} **`{title}`** p.{page}{header_info} _(relevancia: {score_percentage}%)_\n"
-            sources_text += source_line
+            lines.append(f"{i}. {relevance_icon} **`{title}`** p.{page}{header_info} _(relevancia: {score_percentage}%)_\n")
         
-        return sources_text
+        return "".join(lines)
         
     except Exception as e:
         print(f"Error formatting sources: {e}")  # Debug log
@@ -105,18 +103,35 @@ def create_enhanced_message(content, author="Asistente", elements=None):
 llm = MistralLLM(api_key=os.getenv("MISTRAL_API_KEY"))
 embedding_admin = EmbeddingControllerQdrant()
 
+# Near-duplicate questions (cosine >= 0.92) reuse a previous answer and its
+# sources, as long as it was built from the current KB index within the last hour
+response_cache = SemanticCache(
+    embedding_admin.qdrant_client,
+    collection_name=FRONTEND_CACHE_COLLECTION_NAME,
+    threshold=0.92,
+    ttl=3600
+)
+
+# Seconds a cache lookup may reuse the last index fingerprint read from Qdrant
+FINGERPRINT_MAX_AGE = 10.0
+
+# Language indicators: words are matched as whole tokens ("de" no longer
+# matches inside "department"), Spanish characters anywhere in the text
+_WORD_RE = re.compile(r"\w+")
+_SPANISH_CHARS_RE = re.compile(r"[áéíóúñ¿¡]")
+SPANISH_INDICATORS = frozenset({'de', 'la', 'el', 'en', 'y', 'a', 'es', 'son', 'está', 'tiene'})
+ENGLISH_INDICATORS = frozenset({'the', 'and', 'is', 'are', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by'})
+
 def detect_language(text: str) -> str:
     """
     Simple language detection for Spanish vs English.
     This is a basic implementation - you could use a more sophisticated library like 'langdetect'
     """
-    # Simple heuristics for language detection
-    spanish_indicators = ['á', 'é', 'í', 'ó', 'ú', 'ñ', '¿', '¡', 'de', 'la', 'el', 'en', 'y', 'a', 'es', 'son', 'está', 'tiene']
-    english_indicators = ['the', 'and', 'is', 'are', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by']
-    
+    # Count distinct indicators present, from a single tokenization pass
     text_lower = text.lower()
-    spanish_count = sum(1 for indicator in spanish_indicators if indicator in text_lower)
-    english_count = sum(1 for indicator in english_indicators if indicator in text_lower)
+    tokens = set(_WORD_RE.findall(text_lower))
+    spanish_count = len(tokens & SPANISH_INDICATORS) + len(set(_SPANISH_CHARS_RE.findall(text_lower)))
+    english_count = len(tokens & ENGLISH_INDICATORS)
     
     if spanish_count > english_count:
         return "español"
@@ -195,6 +210,33 @@ def optimize_for_english_kb_spanish_qa(user_question: str, detected_language: st
     
     return search_query, context_language, response_language
 
+def prepare_search(user_question: str) -> tuple[str, str, str, str, list]:
+    """
+    Blocking part of the lookup: language detection, translation to English and
+    query embedding. Runs in a worker thread so the event loop stays free.
+    
+    Returns:
+        tuple: (detected_language, search_query, context_language, response_language, embed_question)
+    """
+    # 3) Detect language and optimize for English KB + Spanish Q&A workflow
+    detected_language = detect_language(user_question)
+    
+    # 4) Optimize workflow: Always search KB in English, always respond in Spanish
+    search_query, context_language, response_language = optimize_for_english_kb_spanish_qa(
+        user_question, detected_language
+    )
+    
+    embed_question = embedding_admin.generate_embeddings([search_query])[0]
+    return detected_language, search_query, context_language, response_language, embed_question
+
+async def close_clients():
+    # The LLM client is shared by every chat session: close it with the app
+    await llm.aclose()
+
+# Older Chainlit releases have no shutdown hook; there the connections close with the process
+if hasattr(cl, "on_app_shutdown"):
+    cl.on_app_shutdown(close_clients)
+
 @cl.on_chat_start
 async def start():
     """Initialize the chat session with a welcome message."""
@@ -215,7 +257,10 @@ async def main(message: cl.Message):
     history = cl.user_session.get("history")
     history.append({"role": "user", "content": message.content})
 
-    # 2) Show processing indicator if configured
+    # 2) Start translation + embedding now, so it overlaps with the processing indicator
+    search_task = asyncio.create_task(asyncio.to_thread(prepare_search, message.content))
+
+    # Show processing indicator if configured
     if DISPLAY_CONFIG["visual_elements"].get("processing_indicator", True):
         processing_msg = DISPLAY_CONFIG["error_messages"].get("processing", "🔄 **Procesando tu consulta...**")
         await cl.Message(
@@ -224,47 +269,57 @@ async def main(message: cl.Message):
         ).send()
 
     try:
-        # 3) Detect language and optimize for English KB + Spanish Q&A workflow
-        detected_language = detect_language(message.content)
+        detected_language, search_query, context_language, response_language, embed_question = await search_task
         
-        # 4) Optimize workflow: Always search KB in English, always respond in Spanish
-        search_query, context_language, response_language = optimize_for_english_kb_spanish_qa(
-            message.content, detected_language
-        )
+        main_message = create_enhanced_message(content="", author="Asistente")
         
         # 5) Extract context from Qdrant using optimized search query
-        embed_question = embedding_admin.generate_embeddings(search_query)
-        context_response = embedding_admin.load_and_query_qdrant(embed_question, top_k=5)
+        index_fingerprint = await asyncio.to_thread(embedding_admin.index_fingerprint, FINGERPRINT_MAX_AGE)
+        cached = await asyncio.to_thread(response_cache.get, embed_question, index_fingerprint)
+        if cached:
+            print(f"⚡ Semantic cache hit, skipping KB search and LLM generation")
+            # Rebuild objects with the .payload/.score interface of Qdrant matches
+            context_response = [SimpleNamespace(**source) for source in cached["sources"]]
+            respuesta = cached["answer"]
+        else:
+            context_response = await asyncio.to_thread(embedding_admin.load_and_query_qdrant, embed_question, top_k=5)
 
-        print("Context response type:", type(context_response))
-        if context_response:
-            print("First match payload:", context_response[0].payload if context_response else "No matches")
+            print("Context response type:", type(context_response))
+            if context_response:
+                print("First match payload:", context_response[0].payload if context_response else "No matches")
 
-        context_texts = [match.payload['text'] for match in context_response]
-        context = "\n".join(context_texts)
+            context = "\n".join(match.payload['text'] for match in context_response)
 
-        print(f"Context: {context}")
-        print(f"Detected language: {detected_language}")
-        print(f"Search query: {search_query}")
-        print(f"Context language: {context_language}")
-        print(f"Response language: {response_language}")
+            print(f"Context: {context}")
+            print(f"Detected language: {detected_language}")
+            print(f"Search query: {search_query}")
+            print(f"Context language: {context_language}")
+            print(f"Response language: {response_language}")
 
-        # 6) Keep English context and use English question for optimal LLM processing
-        # The LLM will receive English context + English question but respond in Spanish
-        print(f"🔄 Using English context + English question for optimal LLM processing")
+            # 6) Keep English context and use English question for optimal LLM processing
+            # The LLM will receive English context + English question but respond in Spanish
+            print(f"🔄 Using English context + English question for optimal LLM processing")
         
-        # 7) Set LLM to always respond in Spanish
-        llm.language = "español"
+            # 7) Set LLM to always respond in Spanish
+            llm.language = "español"
         
-        # 8) RAG pipeline with English context + English question, Spanish response
-        respuesta = llm.mistral_chat(context=context, question=search_query)
+            # 8) RAG pipeline with English context + English question, Spanish response,
+            #    streamed to the UI as it is generated
+            response_parts = []
+            async for token in llm.amistral_chat_stream(context=context, question=search_query):
+                response_parts.append(token)
+                await main_message.stream_token(token)
+            respuesta = "".join(response_parts)
 
-        # 7) Create enhanced main response
-        formatted_response = format_main_response(respuesta)
-        main_message = create_enhanced_message(
-            content=formatted_response,
-            author="Asistente"
-        )
+            # Store answer + sources for near-duplicate questions
+            await asyncio.to_thread(response_cache.put, embed_question, {
+                "question": search_query,
+                "answer": respuesta,
+                "sources": [{"payload": match.payload, "score": match.score} for match in context_response]
+            }, index_fingerprint)
+
+        # 7) Replace the raw stream (if any) with the enhanced main response
+        main_message.content = format_main_response(respuesta)
         await main_message.send()
         
         # 6) Display sources with enhanced formatting if configured
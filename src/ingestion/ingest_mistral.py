@@ -1,11 +1,20 @@
 import os
 import re
 import base64
-import json
+import asyncio
 import time
+import httpx
 from mistralai import Mistral
 from langchain.text_splitter import RecursiveCharacterTextSplitter, MarkdownHeaderTextSplitter
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+# 57 KiB: a multiple of 3, so each block base64-encodes without padding
+PDF_ENCODE_BLOCK_SIZE = 57 * 1024
+
+# Chunk contextualization requests in flight at once (Mistral rate limits)
+CONTEXTUALIZE_CONCURRENCY = int(os.getenv("CONTEXTUALIZE_CONCURRENCY", "4"))
 
 
 def print_stage_title(title: str, stage_number: int = None):
@@ -49,7 +58,82 @@ def retry_with_backoff(func, max_retries=3, base_delay=1):
     return None
 
 
+def _is_retryable_async(e: Exception) -> bool:
+    """Server errors, rate limits (429) and timeouts are worth retrying"""
+    if isinstance(e, httpx.TimeoutException):
+        return True
+    status_code = getattr(e, 'status_code', None)
+    return status_code is not None and (status_code == 429 or status_code >= 500)
+
+
+async def aretry_with_backoff(func, max_retries=5, base_delay=1):
+    """Async retry_with_backoff: awaits func() and also retries rate limits and timeouts"""
+    for attempt in range(max_retries):
+        try:
+            return await func()
+        except Exception as e:
+            if attempt == max_retries - 1 or not _is_retryable_async(e):
+                raise e
+            
+            delay = base_delay * (2 ** attempt)
+            print(f"⚠️  Error temporal (intento {attempt + 1}/{max_retries}): {str(e)}")
+            print(f"⏳ Reintentando en {delay} segundos...")
+            await asyncio.sleep(delay)
+    
+    return None
+
+
+def run_coroutine(coro):
+    """asyncio.run that also works when called from a running event loop (runs it in a worker thread)"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
+
+
 class MistralExtractionController:
+    # Patterns compiled once; each category is a single alternation searched once per chunk
+    _IMAGE_RE = re.compile(
+        r'!\[.*?\]\(.*?\)'      # Markdown images
+        r'|<img[^>]*>'          # HTML images
+        r'|imagen\s*\d+'        # Referencias a imágenes
+        r'|figura\s*\d+',       # Referencias a figuras
+        re.IGNORECASE
+    )
+    _TABLE_RE = re.compile(
+        r'\|.*?\|'              # Markdown tables
+        r'|<table[^>]*>'        # HTML tables
+        r'|tabla\s*\d+',        # Referencias a tablas
+        re.IGNORECASE | re.MULTILINE
+    )
+    _FORMULA_RE = re.compile(
+        r'\$.*?\$'              # LaTeX inline (also matches the start of $$...$$ blocks)
+        r'|\\\(.*?\\\)'          # LaTeX parentheses
+        r'|\\\[.*?\\\]',         # LaTeX brackets
+        re.DOTALL
+    )
+    _LIST_RE = re.compile(
+        r'^\s*[-*+]\s+'         # Unordered lists
+        r'|^\s*\d+\.\s+',       # Ordered lists
+        re.MULTILINE
+    )
+    _FIGURE_REFERENCE_RE = re.compile(
+        r'figure\s*\d+|image\s*\d+|graph\s*\d+|diagram\s*\d+|table\s*\d+|figura\s*\d+|imagen\s*\d+|gráfico\s*\d+|tabla\s*\d+',
+        re.IGNORECASE
+    )
+    _INLINE_FORMULA_RE = re.compile(r'\$.*?\$')
+    _INLINE_TABLE_RE = re.compile(r'\|.*?\|')
+    _NUMBER_RE = re.compile(r'\b\d+\.?\d*\b')
+    _HEADER_LINE_RE = re.compile(r'^(#+)\s+(.*?)$', re.MULTILINE)
+    _TECHNICAL_KEYWORDS = (
+        'result', 'analysis', 'graph', 'data', 'measurement', 
+        'experiment', 'method', 'process', 'system',
+        'resultado', 'análisis', 'gráfico', 'datos', 'medición', 
+        'experimento', 'método', 'proceso', 'sistema'
+    )
+    
     def __init__(self, api_key: str):
         self.api_key = api_key
         self.mistral_client = Mistral(api_key=api_key)
@@ -75,8 +159,13 @@ class MistralExtractionController:
     def encode_pdf(self, pdf_path: str) -> str:
         """Encode the pdf to base64."""
         try:
-            with open(pdf_path, "rb") as pdf_file:
-                return base64.b64encode(pdf_file.read()).decode('utf-8')
+            # Encode block by block (multiples of 3 bytes, so no padding in between)
+            # instead of holding the whole raw PDF and its encoding at once
+            encoded = bytearray()
+            with open(pdf_path, "rb", buffering=1 << 20) as pdf_file:
+                while block := pdf_file.read(PDF_ENCODE_BLOCK_SIZE):
+                    encoded += base64.b64encode(block)
+            return encoded.decode('ascii')
         except FileNotFoundError:
             print(f"Error: The file {pdf_path} was not found.")
             return None
@@ -102,12 +191,16 @@ class MistralExtractionController:
             print_sub_stage("PROCESAMIENTO CON MISTRAL OCR")
             print(f"📊 Tamaño PDF en base64: {len(base64_pdf)} caracteres")
             
+            # Build the data URL once, not on every retry
+            document_url = f"data:application/pdf;base64,{base64_pdf}"
+            del base64_pdf
+            
             def call_mistral_ocr():
                 return self.mistral_client.ocr.process(
                     model="mistral-ocr-latest",
                     document={
                         "type": "document_url",
-                        "document_url": f"data:application/pdf;base64,{base64_pdf}"
+                        "document_url": document_url
                     },
                     include_image_base64=True  # Important: This ensures images are included
                 )
@@ -122,8 +215,9 @@ class MistralExtractionController:
                 print(f"📋 Error type: {type(api_error).__name__}")
                 raise
             
-            # Convert response to JSON format
-            response_dict = json.loads(pdf_response.model_dump_json())
+            # Convert response to a dict directly; a JSON round-trip would serialize and
+            # re-parse every base64 image (the dict shares the original strings instead)
+            response_dict = pdf_response.model_dump()
             print(f"📋 Response structure: {list(response_dict.keys())}")
             
             # Extract markdown content from all pages AND images
@@ -134,11 +228,11 @@ class MistralExtractionController:
             self.page_images = {}
             
             if pages and len(pages) > 0:
-                # Concatenate content from all pages and extract images
-                markdown_content = ""
+                # Keep each page's markdown with its number and extract images
+                pages_markdown = []
                 for i, page in enumerate(pages):
                     page_content = page.get("markdown", "")
-                    markdown_content += f"\n\n--- Page {i+1} ---\n\n{page_content}"
+                    pages_markdown.append((i + 1, page_content))
                     
                     # Extract images from this page - be more flexible with the structure
                     page_images = []
@@ -159,6 +253,10 @@ class MistralExtractionController:
                     else:
                         print(f"✅ Page {i+1}: {len(page_content)} characters, no images")
                 
+                # Full text (with page markers) for the summary and the analysis scripts
+                markdown_content = "".join(
+                    f"\n\n--- Page {page_num} ---\n\n{page_content}" for page_num, page_content in pages_markdown
+                )
                 print(f"✅ Total content extracted: {len(markdown_content)} characters")
                 print(f"✅ Total pages with images: {len(self.page_images)}")
                 
@@ -167,6 +265,7 @@ class MistralExtractionController:
                     
             else:
                 markdown_content = response_dict.get("content", "")
+                pages_markdown = [(1, markdown_content)]
                 print(f"⚠️  Using fallback 'content': {len(markdown_content)} characters")
             
             if not markdown_content:
@@ -181,6 +280,7 @@ class MistralExtractionController:
             
             return {
                 "markdown_content": markdown_content,
+                "pages_markdown": pages_markdown,
                 "response_data": response_dict,
                 "original_filename": os.path.basename(pdf_path),
                 "page_images": self.page_images
@@ -200,13 +300,7 @@ class MistralExtractionController:
             return chunk_images
         
         # Strategy 1: If chunk mentions figures/images specifically, include all page images
-        image_references = re.findall(
-            r'(figure\s*\d+|image\s*\d+|graph\s*\d+|diagram\s*\d+|table\s*\d+|figura\s*\d+|imagen\s*\d+|gráfico\s*\d+|tabla\s*\d+)', 
-            chunk_content, 
-            re.IGNORECASE
-        )
-        
-        if image_references:
+        if self._FIGURE_REFERENCE_RE.search(chunk_content):
             # Include all images from this page if chunk references figures
             for img in page_images:
                 if isinstance(img, dict) and 'image_base64' in img:
@@ -218,17 +312,13 @@ class MistralExtractionController:
         
         # Strategy 2: Include images based on content heuristics
         # If chunk has technical content, mathematical formulas, or structured data
-        has_technical_content = any([
-            re.search(r'\$.*?\$', chunk_content),  # LaTeX formulas
-            re.search(r'\|.*?\|', chunk_content),  # Tables
-            len(re.findall(r'\b\d+\.?\d*\b', chunk_content)) > 5,  # Many numbers
-            any(keyword in chunk_content.lower() for keyword in [
-                'result', 'analysis', 'graph', 'data', 'measurement', 
-                'experiment', 'method', 'process', 'system',
-                'resultado', 'análisis', 'gráfico', 'datos', 'medición', 
-                'experimento', 'método', 'proceso', 'sistema'
-            ])
-        ])
+        # Checks short-circuit from cheapest to most expensive
+        has_technical_content = (
+            self._INLINE_FORMULA_RE.search(chunk_content) is not None  # LaTeX formulas
+            or self._INLINE_TABLE_RE.search(chunk_content) is not None  # Tables
+            or next(islice(self._NUMBER_RE.finditer(chunk_content), 5, None), None) is not None  # Many numbers
+            or any(keyword in chunk_content.lower() for keyword in self._TECHNICAL_KEYWORDS)
+        )
         
         if has_technical_content and page_images:
             # Include first image from page for technical content
@@ -274,42 +364,23 @@ class MistralExtractionController:
             print(f"Error generating summary: {str(e)}")
             return "Could not generate document summary."
     
-    def intelligent_chunking(self, markdown_content: str) -> List[Dict[str, Any]]:
+    def intelligent_chunking(self, pages_markdown: List[Tuple[int, str]]) -> List[Dict[str, Any]]:
+        """Chunk each page separately; `pages_markdown` holds (page_number, markdown) pairs."""
         chunks = []
         
         try:
-            # First split by page boundaries
-            page_sections = re.split(r'(--- Page \d+ ---)', markdown_content)
-            
-            # Process pages and their content
-            current_page_num = 1
+            # Headers carry over from one page to the next
             current_headers = {}
             
-            # The first item is content before the first page marker
-            if page_sections and not page_sections[0].strip():
-                page_sections = page_sections[1:]
-            
-            i = 0
-            while i < len(page_sections):
-                section = page_sections[i].strip()
-                
-                # If this is a page marker, update current page number
-                page_match = re.match(r'--- Page (\d+) ---', section)
-                if page_match:
-                    current_page_num = int(page_match.group(1))
-                    i += 1
-                    if i >= len(page_sections):
-                        break
-                    section = page_sections[i].strip()
-                
+            for current_page_num, page_content in pages_markdown:
+                section = page_content.strip()
                 if not section:
-                    i += 1
                     continue
                 
                 # Process this page's content
                 try:
                     # Update headers from this page
-                    header_lines = re.findall(r'^(#+)\s+(.*?)$', section, re.MULTILINE)
+                    header_lines = self._HEADER_LINE_RE.findall(section)
                     for level, title in header_lines:
                         level_key = f"Header {len(level)}"
                         current_headers[level_key] = title.strip()
@@ -369,12 +440,10 @@ class MistralExtractionController:
                             }
                         })
                 
-                i += 1
-                
         except Exception as e:
             print(f"Error in intelligent_chunking: {str(e)}")
             # Fallback to simple character splitting
-            sub_chunks = self.char_splitter.split_text(markdown_content)
+            sub_chunks = self.char_splitter.split_text("\n\n".join(content for _, content in pages_markdown))
             chunks = [{
                 "content": chunk,
                 "metadata": {
@@ -387,66 +456,16 @@ class MistralExtractionController:
         return chunks
     
     def extract_visual_elements(self, chunk_content: str) -> Dict[str, Any]:
-        visual_info = {
-            "has_images": False,
-            "has_tables": False,
-            "has_formulas": False,
-            "has_lists": False
+        return {
+            "has_images": self._IMAGE_RE.search(chunk_content) is not None,
+            "has_tables": self._TABLE_RE.search(chunk_content) is not None,
+            "has_formulas": self._FORMULA_RE.search(chunk_content) is not None,
+            "has_lists": self._LIST_RE.search(chunk_content) is not None
         }
-        
-        # Detectar imágenes
-        image_patterns = [
-            r'!\[.*?\]\(.*?\)',  # Markdown images
-            r'<img[^>]*>',       # HTML images
-            r'imagen\s*\d+',     # Referencias a imágenes
-            r'figura\s*\d+',     # Referencias a figuras
-        ]
-        
-        for pattern in image_patterns:
-            matches = re.findall(pattern, chunk_content, re.IGNORECASE)
-            if matches:
-                visual_info["has_images"] = True
-        
-        # Detectar tablas
-        table_patterns = [
-            r'\|.*?\|',          # Markdown tables
-            r'<table[^>]*>',     # HTML tables
-            r'tabla\s*\d+',      # Referencias a tablas
-        ]
-        
-        for pattern in table_patterns:
-            matches = re.findall(pattern, chunk_content, re.IGNORECASE | re.MULTILINE)
-            if matches:
-                visual_info["has_tables"] = True
-        
-        # Detectar fórmulas
-        formula_patterns = [
-            r'\$.*?\$',          # LaTeX inline
-            r'\$\$.*?\$\$',      # LaTeX block
-            r'\\\(.*?\\\)',      # LaTeX parentheses
-            r'\\\[.*?\\\]',      # LaTeX brackets
-        ]
-        
-        for pattern in formula_patterns:
-            matches = re.findall(pattern, chunk_content, re.DOTALL)
-            if matches:
-                visual_info["has_formulas"] = True
-        
-        # Detectar listas
-        list_patterns = [
-            r'^\s*[-*+]\s+',     # Unordered lists
-            r'^\s*\d+\.\s+',     # Ordered lists
-        ]
-        
-        for pattern in list_patterns:
-            matches = re.findall(pattern, chunk_content, re.MULTILINE)
-            if matches:
-                visual_info["has_lists"] = True
-        
-        return visual_info
     
-    def contextualize_chunk(self, chunk: Dict[str, Any], document_summary: str, 
-                          book_title: str, page_num: int = None) -> Dict[str, Any]:
+    def _contextualization_request(self, chunk: Dict[str, Any], book_title: str,
+                                   page_num: int = None) -> Dict[str, Any]:
+        """Visual info, images and LLM messages for one chunk (shared by the sync and async paths)."""
         chunk_content = chunk["content"]
         
         # Use page_num from chunk metadata if not provided
@@ -492,36 +511,37 @@ Create a brief contextual summary (max 100 words) that:
 IMPORTANT: Do not paraphrase technical terms or change specific values.
 """
         
-        try:
-            context_response = self.mistral_client.chat.complete(
-                model="mistral-small-latest",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": """You are an expert in creating contextualized summaries for RAG systems. 
-                        Preserve the technical information and structure of the original content."""
-                    },
-                    {
-                        "role": "user",
-                        "content": context_prompt
-                    }
-                ]
-            )
-            
-            contextualized_content = context_response.choices[0].message.content
-            
-        except Exception as e:
-            print(f"Error contextualizing chunk {chunk.get('metadata', {}).get('chunk_id', 'unknown')}: {str(e)}")
-            contextualized_content = chunk_content
+        return {
+            "page_num": page_num,
+            "visual_info": visual_info,
+            "chunk_images": chunk_images,
+            "messages": [
+                {
+                    "role": "system",
+                    "content": """You are an expert in creating contextualized summaries for RAG systems. 
+                    Preserve the technical information and structure of the original content."""
+                },
+                {
+                    "role": "user",
+                    "content": context_prompt
+                }
+            ]
+        }
+    
+    def _enhanced_chunk(self, chunk: Dict[str, Any], request: Dict[str, Any], book_title: str,
+                        contextualized_content: str, contextualized: bool = True) -> Dict[str, Any]:
+        chunk_images = request["chunk_images"]
         
         # Enhanced metadata with images
         enhanced_metadata = {
             **chunk.get("metadata", {}),
             "book_title": book_title,
-            "page_number": page_num,
+            "page_number": request["page_num"],
             ##"images": chunk_images,  # TODO: Add images to metadata
             "has_associated_images": len(chunk_images) > 0,
-            **visual_info
+            # False when contextualization failed and the raw chunk content was kept
+            "contextualized": contextualized,
+            **request["visual_info"]
         }
         
         return {
@@ -529,7 +549,73 @@ IMPORTANT: Do not paraphrase technical terms or change specific values.
             "metadata": enhanced_metadata
         }
     
-    def process_document(self, pdf_path: str, book_title: str = None) -> Optional[List[Dict[str, Any]]]:
+    def contextualize_chunk(self, chunk: Dict[str, Any], document_summary: str, 
+                          book_title: str, page_num: int = None) -> Dict[str, Any]:
+        request = self._contextualization_request(chunk, book_title, page_num)
+        
+        try:
+            context_response = self.mistral_client.chat.complete(
+                model="mistral-small-latest",
+                messages=request["messages"]
+            )
+            
+            contextualized_content = context_response.choices[0].message.content
+            contextualized = True
+            
+        except Exception as e:
+            print(f"Error contextualizing chunk {chunk.get('metadata', {}).get('chunk_id', 'unknown')}: {str(e)}")
+            contextualized_content = chunk["content"]
+            contextualized = False
+        
+        return self._enhanced_chunk(chunk, request, book_title, contextualized_content, contextualized)
+    
+    async def acontextualize_chunk(self, chunk: Dict[str, Any], document_summary: str,
+                                   book_title: str, page_num: int = None, client: Mistral = None) -> Dict[str, Any]:
+        """Async version of contextualize_chunk, for running many chunks concurrently (retries with backoff)."""
+        request = self._contextualization_request(chunk, book_title, page_num)
+        client = client or self.mistral_client
+        
+        try:
+            context_response = await aretry_with_backoff(lambda: client.chat.complete_async(
+                model="mistral-small-latest",
+                messages=request["messages"]
+            ))
+            
+            contextualized_content = context_response.choices[0].message.content
+            contextualized = True
+            
+        except Exception as e:
+            print(f"Error contextualizing chunk {chunk.get('metadata', {}).get('chunk_id', 'unknown')}: {str(e)}")
+            contextualized_content = chunk["content"]
+            contextualized = False
+        
+        return self._enhanced_chunk(chunk, request, book_title, contextualized_content, contextualized)
+    
+    async def contextualize_chunks(self, chunks: List[Dict[str, Any]], document_summary: str, book_title: str,
+                                   concurrency: int = CONTEXTUALIZE_CONCURRENCY) -> List[Dict[str, Any]]:
+        """Contextualize all chunks with at most `concurrency` Mistral requests in flight, keeping order."""
+        semaphore = asyncio.Semaphore(concurrency)
+        completed = 0
+        
+        # Pooled connections live in this event loop (process_document runs one loop per document)
+        async with httpx.AsyncClient(limits=httpx.Limits(max_keepalive_connections=concurrency)) as http_client:
+            client = Mistral(api_key=self.api_key, async_client=http_client)
+            
+            async def contextualize(chunk: Dict[str, Any]) -> Dict[str, Any]:
+                nonlocal completed
+                async with semaphore:
+                    enhanced_chunk = await self.acontextualize_chunk(chunk, document_summary, book_title, client=client)
+                
+                # Mostrar progreso cada 10 chunks
+                completed += 1
+                if completed % 10 == 0 or completed == len(chunks):
+                    print(f"      ✅ Completados: {completed}/{len(chunks)} chunks")
+                return enhanced_chunk
+            
+            return await asyncio.gather(*(contextualize(chunk) for chunk in chunks))
+    
+    def process_document(self, pdf_path: str, book_title: str = None,
+                         concurrency: int = CONTEXTUALIZE_CONCURRENCY) -> Optional[List[Dict[str, Any]]]:
         if not book_title:
             book_title = os.path.basename(pdf_path)
         
@@ -541,28 +627,27 @@ IMPORTANT: Do not paraphrase technical terms or change specific values.
         if not extraction_result:
             return None
         
-        # 1.2 Generate summary
+        # 1.2 Generate summary (the API call runs while the chunking below proceeds)
         print_sub_stage("1.2 GENERACIÓN DE RESUMEN DEL DOCUMENTO")
-        document_summary = self.generate_document_summary(extraction_result["markdown_content"])
-        
-        # 1.3 Intelligent chunking
-        print_sub_stage("1.3 DIVISIÓN INTELIGENTE EN CHUNKS")
-        chunks = self.intelligent_chunking(extraction_result["markdown_content"])
-        print(f"   ✅ Generados {len(chunks)} chunks")
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            summary_future = executor.submit(self.generate_document_summary, extraction_result["markdown_content"])
+            
+            # 1.3 Intelligent chunking
+            print_sub_stage("1.3 DIVISIÓN INTELIGENTE EN CHUNKS")
+            chunks = self.intelligent_chunking(extraction_result["pages_markdown"])
+            print(f"   ✅ Generados {len(chunks)} chunks")
+            
+            document_summary = summary_future.result()
         
-        # 1.4 Contextualize chunks
+        # 1.4 Contextualize chunks (concurrent requests, bounded to respect rate limits)
         print_sub_stage("1.4 CONTEXTUALIZACIÓN DE CHUNKS")
-        enhanced_chunks = []
-        for i, chunk in enumerate(chunks):
-            print(f"   🔄 Procesando chunk {i+1}/{len(chunks)}")
-            enhanced_chunk = self.contextualize_chunk(
-                chunk, document_summary, book_title
-            )
-            enhanced_chunks.append(enhanced_chunk)
-            
-            # Mostrar progreso cada 10 chunks
-            if (i + 1) % 10 == 0 or (i + 1) == len(chunks):
-                print(f"      ✅ Completados: {i+1}/{len(chunks)} chunks")
+        print(f"   🔄 Procesando {len(chunks)} chunks ({concurrency} en paralelo)")
+        enhanced_chunks = run_coroutine(self.contextualize_chunks(chunks, document_summary, book_title, concurrency))
+        
+        # Chunks indexed without context after exhausting the retries
+        fallback_count = sum(1 for chunk in enhanced_chunks if not chunk["metadata"]["contextualized"])
+        if fallback_count:
+            print(f"   ⚠️  {fallback_count}/{len(enhanced_chunks)} chunks sin contextualizar (se usa el contenido original)")
         
         # Summary of images included
         total_chunks_with_images = sum(1 for chunk in enhanced_chunks if chunk["metadata"]["has_associated_images"])
@@ -571,6 +656,7 @@ IMPORTANT: Do not paraphrase technical terms or change specific values.
         print_sub_stage("1.5 RESUMEN FINAL DEL PROCESO")
         print(f"   📊 Total de chunks procesados: {len(enhanced_chunks)}")
         print(f"   🖼️  Chunks con imágenes: {total_chunks_with_images}/{len(enhanced_chunks)}")
+        print(f"   🧩 Chunks sin contextualizar: {fallback_count}/{len(enhanced_chunks)}")
         print(f"   📄 Páginas procesadas: {extraction_result.get('total_pages', 'N/A')}")
         print(f"   📝 Contenido total extraído: {len(extraction_result.get('markdown_content', ''))} caracteres")
         
@@ -1,8 +1,9 @@
 import os
 import sys
-import json
+import orjson
 import logging
 import time
+from hashlib import sha1
 from pathlib import Path
 from dotenv import load_dotenv
 from embeddings.embedding_qdrant import EmbeddingControllerQdrant
@@ -15,6 +16,7 @@ load_dotenv(project_root / '.env')
 
 MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY")
 PDF_FOLDER_PATH = os.getenv("PDF_FOLDER_PATH", "./pdfs")
+EMBEDDING_BATCH_SIZE = 64  # Chunks per Ollama embed call
 
 # Create organized output directory structure
 OUTPUT_DIR = project_root / "src" / "output" / "rag"
@@ -56,8 +58,9 @@ def save_results(enhanced_chunks, output_dir, pdf_name):
     output_dir.mkdir(parents=True, exist_ok=True)
     
     # Save complete chunks
-    with open(output_dir / f"enhanced_chunks_mistral_{pdf_name}.json", "w", encoding="utf-8") as f:
-        json.dump(enhanced_chunks, f, indent=2, ensure_ascii=False)
+    (output_dir / f"enhanced_chunks_mistral_{pdf_name}.json").write_bytes(
+        orjson.dumps(enhanced_chunks, option=orjson.OPT_INDENT_2)
+    )
     
     # Save only contextualized content for review
     contextualized_content = []
@@ -74,8 +77,9 @@ def save_results(enhanced_chunks, output_dir, pdf_name):
             }
         })
     
-    with open(output_dir / "contextualized_content.json", "w", encoding="utf-8") as f:
-        json.dump(contextualized_content, f, indent=2, ensure_ascii=False)
+    (output_dir / "contextualized_content.json").write_bytes(
+        orjson.dumps(contextualized_content, option=orjson.OPT_INDENT_2)
+    )
     
     print(f"📁 Results saved in: {output_dir}")
 
@@ -128,21 +132,34 @@ def test_full_mistral_pipeline(pdf_path):
         print_stage_title("GENERACIÓN DE EMBEDDINGS", 2)
         # Generate embeddings with retry mechanism
         print(f"🔄 Generando embeddings para {len(enhanced_chunks)} chunks...")
+        # Byte-identical chunks (repeated headers/clauses) are embedded only once
+        chunk_keys = [sha1(chunk["content"].encode()).digest() for chunk in enhanced_chunks]
+        unique_rows = {}
+        for i, key in enumerate(chunk_keys):
+            unique_rows.setdefault(key, i)
+        unique_texts = [enhanced_chunks[i]["content"] for i in unique_rows.values()]
+        if len(unique_texts) < len(enhanced_chunks):
+            print(f"   ♻️  {len(enhanced_chunks) - len(unique_texts)} chunks duplicados reutilizarán su embedding")
+        
+        unique_embeddings = []
+        for start in range(0, len(unique_texts), EMBEDDING_BATCH_SIZE):
+            batch = unique_texts[start:start + EMBEDDING_BATCH_SIZE]
+            print(f"   🔄 Generando embeddings {start+1}-{start+len(batch)}/{len(unique_texts)}")
+            unique_embeddings.extend(embedding_controller.generate_embeddings(batch))
+        
+        embedding_by_key = dict(zip(unique_rows, unique_embeddings))
         embeddings = []
         failed_embeddings = 0
-        
-        for i, chunk in enumerate(enhanced_chunks):
-            print(f"   🔄 Generando embedding {i+1}/{len(enhanced_chunks)}")
-            
-            try:
-                embedding = embedding_controller.generate_embeddings(chunk["content"])
+        for i, key in enumerate(chunk_keys, 1):
+            embedding = embedding_by_key.get(key)
+            if embedding:
                 embeddings.append(embedding)
-            except Exception as e:
+            else:
                 failed_embeddings += 1
-                print(f"      ❌ Error generando embedding {i+1}: {str(e)}")
+                print(f"      ❌ Error generando embedding {i}")
                 # Add a placeholder embedding to maintain index alignment
                 embeddings.append([0.0] * 768)  # Default embedding dimension
-                print(f"      ⚠️  Usando embedding por defecto para chunk {i+1}")
+                print(f"      ⚠️  Usando embedding por defecto para chunk {i}")
         
         if failed_embeddings > 0:
             print(f"⚠️  {failed_embeddings} embeddings fallaron, usando valores por defecto")
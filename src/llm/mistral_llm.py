@@ -1,13 +1,22 @@
 import os
+import httpx
 from mistralai import Mistral
 from config.prompt_config import get_rag_system_prompt, get_rag_user_prompt, format_prompt
 
 class MistralLLM:
     def __init__(self, api_key: str) -> None:
-        self.mistral_client = Mistral(api_key=api_key)
+        # Pooled keep-alive connections for async callers (TLS handshakes are reused)
+        self.async_http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_keepalive_connections=100)
+        )
+        self.mistral_client = Mistral(api_key=api_key, async_client=self.async_http_client)
         self.language = "español"
 
-    def mistral_chat(self, context, question: str) -> str:
+    async def aclose(self) -> None:
+        """Close the pooled async HTTP connections (call once when the app shuts down)."""
+        await self.async_http_client.aclose()
+
+    def _build_messages(self, context, question: str) -> list:
         # Get prompts from centralized configuration
         system_prompt = get_rag_system_prompt(self.language)
         user_prompt_template = get_rag_user_prompt(self.language)
@@ -15,20 +24,44 @@ class MistralLLM:
         # Format the user prompt with context and question
         user_prompt = format_prompt(user_prompt_template, context=context, question=question)
 
+        return [
+            {
+                "role": "system",
+                "content": system_prompt
+            },
+            {
+                "role": "user",
+                "content": user_prompt
+            }
+        ]
+
+    def mistral_chat(self, context, question: str) -> str:
         response = self.mistral_client.chat.complete(
             model="mistral-small-latest",
-            messages=[
-                {
-                    "role": "system",
-                    "content": system_prompt
-                },
-                {
-                    "role": "user",
-                    "content": user_prompt
-                }
-            ]
+            messages=self._build_messages(context, question)
+        )
+
+        response = str(response.choices[0].message.content)
+        return response
+
+    async def amistral_chat(self, context, question: str) -> str:
+        response = await self.mistral_client.chat.complete_async(
+            model="mistral-small-latest",
+            messages=self._build_messages(context, question)
         )
 
         response = str(response.choices[0].message.content)
         return response
     
+
+    async def amistral_chat_stream(self, context, question: str):
+        """Yield the response text in pieces as Mistral generates it."""
+        stream = await self.mistral_client.chat.stream_async(
+            model="mistral-small-latest",
+            messages=self._build_messages(context, question)
+        )
+
+        async for event in stream:
+            delta = event.data.choices[0].delta.content
+            if delta:
+                yield str(delta)
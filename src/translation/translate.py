@@ -1,7 +1,54 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import diskcache
 from translate import Translator
 
+# Translations are deterministic for a given text: keep them across restarts
+TRANSLATION_CACHE_DIR = Path(__file__).resolve().parents[2] / ".translation_cache"
+TRANSLATION_CACHE_EXPIRE = 30 * 24 * 3600  # seconds
+_translation_cache = diskcache.Cache(str(TRANSLATION_CACHE_DIR))
+
+# In-process LRU in front of the disk cache
+_MEMORY_CACHE_SIZE = 10000
+_memory_cache: "OrderedDict[str, str]" = OrderedDict()
+_memory_cache_lock = threading.Lock()
+
+# The provider returns its errors (quota, length limit, bad language pair) as the translation
+_PROVIDER_ERROR_MARKERS = (
+    "MYMEMORY WARNING",
+    "QUERY LENGTH LIMIT",
+    "INVALID LANGUAGE PAIR",
+    "PLEASE SELECT TWO DISTINCT LANGUAGES",
+)
+
+def _is_cacheable(text: str, translation: str) -> bool:
+    """Provider errors and untranslated echoes of the input are not cached."""
+    if not translation or translation.strip() == text.strip():
+        return False
+    upper = translation.upper()
+    return not any(marker in upper for marker in _PROVIDER_ERROR_MARKERS)
+
 def translate_text(text: str, source_lang: str = "es", target_lang: str = "en") -> str:
-    translator = Translator(from_lang=source_lang, to_lang=target_lang)
-    translation = translator.translate(text)
+    key = hashlib.sha256(f"{source_lang}:{target_lang}:{text}".encode("utf-8")).hexdigest()
+    with _memory_cache_lock:
+        translation = _memory_cache.get(key)
+        if translation is not None:
+            _memory_cache.move_to_end(key)
+            return translation
+
+    translation = _translation_cache.get(key)
+    if translation is None:
+        translator = Translator(from_lang=source_lang, to_lang=target_lang)
+        translation = translator.translate(text)
+        if not _is_cacheable(text, translation):
+            return translation
+        _translation_cache.set(key, translation, expire=TRANSLATION_CACHE_EXPIRE)
+
+    with _memory_cache_lock:
+        _memory_cache[key] = translation
+        if len(_memory_cache) > _MEMORY_CACHE_SIZE:
+            _memory_cache.popitem(last=False)
     return translation
-    
\ No newline at end of file